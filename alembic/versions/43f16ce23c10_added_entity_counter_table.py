@@ -0,0 +1,39 @@
+"""added entity counter table
+
+Revision ID: 43f16ce23c10
+Revises: 506ebd390ab8
+Create Date: 2026-10-18 08:02:11.514093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '43f16ce23c10'
+down_revision: Union[str, Sequence[str], None] = '506ebd390ab8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('entity_counter',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("""
+        INSERT INTO entity_counter (name, count)
+        SELECT 'doctors', count(*) FROM doctor WHERE is_deleted = false
+        UNION ALL SELECT 'patients', count(*) FROM patient WHERE is_deleted = false
+        UNION ALL SELECT 'appointments', count(*) FROM appointment WHERE is_deleted = false
+        UNION ALL SELECT 'medical_records', count(*) FROM medical_record WHERE is_deleted = false
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('entity_counter')
@@ -0,0 +1,63 @@
+"""added indexes for hot queries
+
+Revision ID: 506ebd390ab8
+Revises: fb8c93225035
+Create Date: 2026-10-18 07:36:34.120417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '506ebd390ab8'
+down_revision: Union[str, Sequence[str], None] = 'fb8c93225035'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NOT_DELETED = sa.text("is_deleted = false")
+
+# (name, table, columns, unique, partial)
+INDEXES = [
+    ('ix_appointment_time_active', 'appointment', ['appointment_time', 'id'], False, True),
+    ('ix_appointment_doctor_time_active', 'appointment', ['doctor_id', 'appointment_time', 'id'], False, True),
+    ('ix_appointment_patient_time_active', 'appointment', ['patient_id', 'appointment_time', 'id'], False, True),
+    ('ix_medical_record_visit_active', 'medical_record', ['visit_date', 'id'], False, True),
+    ('ix_medical_record_doctor_visit_active', 'medical_record', ['doctor_id', 'visit_date', 'id'], False, True),
+    ('ix_medical_record_patient_visit_active', 'medical_record', ['patient_id', 'visit_date', 'id'], False, True),
+    ('ix_doctor_last_name_active', 'doctor', ['last_name', 'id'], False, True),
+    ('ix_patient_last_name_active', 'patient', ['last_name', 'id'], False, True),
+    ('ux_role_permission_role_permission', 'role_permission', ['role_id', 'permission_id'], True, False),
+]
+
+# True for an index left INVALID by a failed CREATE INDEX CONCURRENTLY, NULL when there is no such index.
+INVALID_INDEX_SQL = sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)")
+
+
+def drop_invalid_index(name: str, table: str):
+    # if_not_exists would otherwise keep the broken index on a rerun, and queries would silently go without it.
+    if op.get_bind().execute(INVALID_INDEX_SQL, {"name": name}).scalar():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique, partial in INDEXES:
+            drop_invalid_index(name, table)
+            op.create_index(
+                name, table, columns, unique=unique,
+                postgresql_where=NOT_DELETED if partial else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique, partial in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
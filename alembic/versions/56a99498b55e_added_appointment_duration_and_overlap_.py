@@ -0,0 +1,78 @@
+"""added appointment duration and overlap constraint
+
+Revision ID: 56a99498b55e
+Revises: 6c9a98bee717
+Create Date: 2026-10-18 14:05:12.481903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '56a99498b55e'
+down_revision: Union[str, Sequence[str], None] = '6c9a98bee717'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_DURATION_MINUTES = 30
+DOCTORS_PER_BATCH = 100
+
+# Existing appointments get the default duration, cut short where the doctor's next active appointment starts
+# earlier, so double bookings already in the table become empty ranges instead of failing the constraint.
+# {scope} selects the doctors whose appointments are recomputed.
+BACKFILL_SQL = f"""
+    WITH ordered AS (
+        SELECT id, appointment_time,
+               lead(appointment_time) OVER (
+                   PARTITION BY doctor_id, is_deleted ORDER BY appointment_time, id
+               ) AS next_time
+        FROM appointment
+        WHERE {{scope}}
+    ), duration AS (
+        SELECT id, CAST(LEAST({DEFAULT_DURATION_MINUTES},
+                              floor(extract(epoch FROM next_time - appointment_time) / 60)) AS integer) AS minutes
+        FROM ordered
+    )
+    UPDATE appointment a
+    SET duration_minutes = d.minutes, end_time = a.appointment_time + d.minutes * interval '1 minute'
+    FROM duration d
+    WHERE a.id = d.id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('appointment', sa.Column('duration_minutes', sa.Integer(), server_default=sa.text(
+        str(DEFAULT_DURATION_MINUTES)), nullable=False))
+    op.add_column('appointment', sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    # Each batch commits on its own so the table is never locked for the whole backfill.
+    with op.get_context().autocommit_block():
+        max_doctor_id = op.get_bind().execute(sa.text("SELECT max(doctor_id) FROM appointment")).scalar() or 0
+        for low in range(0, max_doctor_id + 1, DOCTORS_PER_BATCH):
+            op.execute(sa.text(BACKFILL_SQL.format(scope="doctor_id >= :low AND doctor_id < :high")).bindparams(
+                low=low, high=low + DOCTORS_PER_BATCH))
+
+    # Rows written by the previous release while the backfill ran get the same trimming, with writes blocked
+    # until the constraint is in place. Their doctors' calendars are recomputed as a whole so a late row that
+    # lands between two backfilled ones is cut short as well.
+    op.execute("LOCK TABLE appointment IN SHARE ROW EXCLUSIVE MODE")
+    op.execute(BACKFILL_SQL.format(
+        scope="doctor_id IN (SELECT doctor_id FROM appointment WHERE end_time IS NULL)"))
+    op.alter_column('appointment', 'end_time', nullable=False)
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute("""
+        ALTER TABLE appointment ADD CONSTRAINT ex_appointment_doctor_overlap
+        EXCLUDE USING gist (doctor_id WITH =, tsrange(appointment_time, end_time, '[)') WITH &&)
+        WHERE (is_deleted = false)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('ex_appointment_doctor_overlap', 'appointment')
+    op.drop_column('appointment', 'end_time')
+    op.drop_column('appointment', 'duration_minutes')
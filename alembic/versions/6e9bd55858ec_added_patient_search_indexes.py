@@ -0,0 +1,57 @@
+"""added patient search indexes
+
+Revision ID: 6e9bd55858ec
+Revises: e8a816790a16
+Create Date: 2026-10-18 08:16:58.372041
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e9bd55858ec'
+down_revision: Union[str, Sequence[str], None] = 'e8a816790a16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = [
+    ('ix_patient_first_name_trgm_active', 'first_name'),
+    ('ix_patient_last_name_trgm_active', 'last_name'),
+    ('ix_patient_contact_digits_trgm_active', 'contact_digits'),
+]
+
+# True for an index left INVALID by a failed CREATE INDEX CONCURRENTLY, NULL when there is no such index.
+INVALID_INDEX_SQL = sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)")
+
+
+def drop_invalid_index(name: str, table: str):
+    # if_not_exists would otherwise keep the broken index on a rerun, and queries would silently go without it.
+    if op.get_bind().execute(INVALID_INDEX_SQL, {"name": name}).scalar():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Adding a stored generated column rewrites patient once, under an ACCESS EXCLUSIVE lock that blocks reads and
+    # writes of patients until it finishes; schedule it for a maintenance window on large installations.
+    op.add_column('patient', sa.Column('contact_digits', sa.String(), sa.Computed(
+        "regexp_replace(contact_number, '[^0-9]', '', 'g')", persisted=True), nullable=True))
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        for name, column in TRIGRAM_INDEXES:
+            drop_invalid_index(name, 'patient')
+            op.create_index(name, 'patient', [column], unique=False, postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'}, postgresql_where=sa.text('is_deleted = false'),
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, column in reversed(TRIGRAM_INDEXES):
+            op.drop_index(name, table_name='patient', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('patient', 'contact_digits')
@@ -0,0 +1,55 @@
+"""added medical record search vector
+
+Revision ID: e8a816790a16
+Revises: 56a99498b55e
+Create Date: 2026-10-18 08:14:31.205276
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a816790a16'
+down_revision: Union[str, Sequence[str], None] = '56a99498b55e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english'::regconfig, diagnosis), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, treatment), 'B') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(notes, '')), 'C')"
+)
+
+# True for an index left INVALID by a failed CREATE INDEX CONCURRENTLY, NULL when there is no such index.
+INVALID_INDEX_SQL = sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)")
+
+
+def drop_invalid_index(name: str, table: str):
+    # if_not_exists would otherwise keep the broken index on a rerun, and queries would silently go without it.
+    if op.get_bind().execute(INVALID_INDEX_SQL, {"name": name}).scalar():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Adding a stored generated column rewrites medical_record once; schedule it for a maintenance window on
+    # large installations.
+    op.add_column('medical_record', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(
+        SEARCH_VECTOR_SQL, persisted=True), nullable=True))
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        drop_invalid_index('ix_medical_record_search_active', 'medical_record')
+        op.create_index('ix_medical_record_search_active', 'medical_record', ['search_vector'], unique=False,
+                        postgresql_using='gin', postgresql_where=sa.text('is_deleted = false'),
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_medical_record_search_active', table_name='medical_record', postgresql_concurrently=True,
+                      if_exists=True)
+    op.drop_column('medical_record', 'search_vector')
@@ -1,10 +1,32 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.enums import PermissionsEnum, RoleEnum, RolePermissionsMap
+from app.schema.user import Principal
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Verified token payloads keyed by the token's SHA-256 digest; each entry is dropped at its own "exp" (wall clock).
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAX_SIZE, timer=time.time)
+
+# Bit position of every permission in the "perms" claim follows PermissionsEnum declaration order.
+PERMISSION_BITS = {permission: 1 << index for index, permission in enumerate(PermissionsEnum)}
+
+# Changes whenever the enum order or the seeded role -> permission mappings change, so tokens carrying
+# permission claims from an older mapping are rejected and clients have to login again.
+PERMISSIONS_VERSION = hashlib.sha256(repr([
+    [permission.value for permission in PermissionsEnum],
+    sorted((role.value, sorted(permission.value for permission in permissions))
+           for role, permissions in RolePermissionsMap.items()),
+]).encode()).hexdigest()[:12]
+
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -14,6 +36,80 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so hashing never blocks the event loop.
+
+    At most ``workers + max_queue`` jobs are handed to the pool; further callers wait on the event loop.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._slots = asyncio.Semaphore(workers + max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    def _call(self, func, *args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run(self, func, *args):
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            with self._lock:
+                self.queued += 1
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, func, *args)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "waiting": self.waiting,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+        }
+
+
+password_hasher = PasswordHasher(workers=settings.PASSWORD_HASH_WORKERS, max_queue=settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hashes_async(passwords: list, concurrency: int = settings.PASSWORD_HASH_WORKERS) -> list:
+    # Bulk callers keep only a few jobs in the shared pool at a time, so logins are not queued behind a whole import.
+    limit = asyncio.Semaphore(concurrency)
+
+    async def hash_one(password: str) -> str:
+        async with limit:
+            return await get_password_hash_async(password)
+
+    return await asyncio.gather(*(hash_one(password) for password in passwords))
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -23,3 +119,51 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 def decode_token(token: str):
     return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def decode_token_cached(token: str):
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = decode_token(token)
+        if payload.get("exp") is not None:
+            token_cache.set(key, payload, expires_at=payload["exp"])
+    return payload
+
+
+def encode_permissions(permissions) -> int:
+    mask = 0
+    for permission in permissions:
+        mask |= PERMISSION_BITS[permission]
+    return mask
+
+
+def decode_permissions(mask: int) -> frozenset:
+    return frozenset(permission for permission, bit in PERMISSION_BITS.items() if mask & bit)
+
+
+def create_principal_token(principal: Principal, expires_delta: timedelta = None):
+    claims = {"sub": principal.email}
+    if settings.TOKEN_EMBED_PERMISSIONS:
+        claims.update({
+            "uid": principal.id,
+            "rid": principal.role_id,
+            "role": principal.role.value,
+            "perms": encode_permissions(principal.permissions),
+            "doc": principal.doctor_id,
+            "pat": principal.patient_id,
+            "pv": PERMISSIONS_VERSION,
+        })
+    return create_access_token(data=claims, expires_delta=expires_delta)
+
+
+def principal_from_claims(payload: dict) -> Principal:
+    return Principal(
+        id=payload["uid"],
+        email=payload["sub"],
+        role_id=payload["rid"],
+        role=RoleEnum(payload["role"]),
+        permissions=decode_permissions(payload["perms"]),
+        doctor_id=payload.get("doc"),
+        patient_id=payload.get("pat"),
+    )
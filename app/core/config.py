@@ -7,9 +7,58 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: str
     DB_NAME: str
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
     ALGORITHM: str = "HS256"
     SECRET_KEY: str = "your-secret-key"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_EMBED_PERMISSIONS: bool = False
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+
+    DEFAULT_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 500
+    STREAM_YIELD_PER: int = 1000
+
+    COUNTER_RECONCILE_INTERVAL_SECONDS: int = 300
+    SEED_ON_STARTUP: bool = False
+
+    ROLLUP_DEFAULT_RANGE_DAYS: int = 30
+    ROLLUP_MAX_RANGE_DAYS: int = 366
+    ROLLUP_RECONCILE_INTERVAL_SECONDS: int = 3600
+
+    WORKING_DAY_START_HOUR: int = 8
+    WORKING_DAY_END_HOUR: int = 18
+    WORKING_WEEKDAYS: list[int] = [0, 1, 2, 3, 4]
+    AVAILABILITY_DEFAULT_RANGE_DAYS: int = 7
+    AVAILABILITY_MAX_RANGE_DAYS: int = 62
+    AVAILABILITY_DEFAULT_LIMIT: int = 20
+
+    MEDICAL_RECORD_SEARCH_MAX_CANDIDATES: int = 10000
+
+    PATIENT_SEARCH_MIN_LENGTH: int = 3
+    PATIENT_SEARCH_DEFAULT_LIMIT: int = 10
+    PATIENT_SEARCH_MAX_LIMIT: int = 50
+
+    IMPORT_CHUNK_SIZE: int = 1000
+    IMPORT_MAX_REPORTED_ERRORS: int = 1000
+
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+
+    METRICS_ENABLED: bool = True
+
+    QUERY_GUARD_ENABLED: bool = False
+    QUERY_GUARD_MODE: str = "warn"
+    QUERY_GUARD_MAX_STATEMENTS: int = 25
+    QUERY_GUARD_MAX_REPEATS: int = 5
 
     class Config:
         env_file = ".env"
@@ -1,9 +1,63 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import exc, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.query_guard import install_query_guard
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited and how many checkouts timed out."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
 
 DB_URL = f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
-engine = create_async_engine(DB_URL, echo=True)
+engine = create_async_engine(
+    f"{DB_URL}?prepared_statement_cache_size={settings.DB_STATEMENT_CACHE_SIZE}",
+    echo=settings.DB_ECHO,
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+if settings.QUERY_GUARD_ENABLED:
+    install_query_guard(engine)
 SessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -13,7 +67,75 @@ SessionLocal = sessionmaker(
 )
 Base = declarative_base()
 
+logger = logging.getLogger(__name__)
+
+
+def get_pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "in_use": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checkouts": pool_stats.checkouts,
+        "timeouts": pool_stats.timeouts,
+        "wait_avg_ms": round(pool_stats.wait_total / pool_stats.checkouts * 1000, 3) if pool_stats.checkouts else 0.0,
+        "wait_max_ms": round(pool_stats.wait_max * 1000, 3),
+    }
+
+
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+EXCLUSION_VIOLATION = "23P01"
+
+
+def get_sqlstate(error: exc.DBAPIError) -> str:
+    # The asyncpg adapter exposes the SQLSTATE on the wrapped error; older versions only on its cause.
+    return getattr(error.orig, "sqlstate", None) or getattr(error.orig.__cause__, "sqlstate", None)
+
+
+async def get_driver_connection(db: AsyncSession):
+    # The asyncpg connection behind the session's current transaction, for COPY and other driver-only calls.
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
 
 async def get_db():
     async with SessionLocal() as session:
         yield session
+
+
+async def stream_rows(query, yield_per: int = settings.STREAM_YIELD_PER):
+    # Streams outlive the request-scoped session, so they own one and read through a server-side cursor.
+    async with SessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=yield_per))
+        async for row in result:
+            yield row
+
+
+async def run_periodically_on_one_worker(lock_name: str, interval_seconds: int, job):
+    """Runs ``job()`` every ``interval_seconds`` in whichever worker holds the ``lock_name`` advisory lock.
+
+    Every worker calls this from its lifespan. The session-level lock lives on a connection the leading worker keeps
+    for as long as it leads, so the job runs once per interval across all workers; when the leader exits, its
+    connection closes and another worker takes over on its next attempt."""
+    while True:
+        try:
+            async with engine.connect() as connection:
+                await connection.execution_options(isolation_level="AUTOCOMMIT")
+                if await connection.scalar(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": lock_name}):
+                    try:
+                        while True:
+                            await asyncio.sleep(interval_seconds)
+                            # Fails once the lock connection is gone, and with it the lock.
+                            await connection.execute(text("SELECT 1"))
+                            await job()
+                    finally:
+                        # The connection goes back to the pool, which would otherwise keep the lock.
+                        await connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"),
+                                                 {"name": lock_name})
+        except Exception:
+            logger.exception("Periodic job %s failed", lock_name)
+        await asyncio.sleep(interval_seconds)
@@ -1,19 +1,62 @@
+from datetime import date, timedelta
 from typing import Callable
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, ExpiredSignatureError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.auth import decode_token
+from app.core.auth import decode_token_cached, principal_from_claims, PERMISSIONS_VERSION
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.enums import PermissionsEnum
-from app.core.responses import UnauthorizedException, TokenExpired, ForbiddenException
+from app.core.responses import UnauthorizedException, TokenExpired, ForbiddenException, BadRequestException
 from app.crud import role_perm as role_perm_crud
-from app.crud.user import get_user_by_email
+from app.crud.user import get_principal_by_email
 
 bearer_scheme = HTTPBearer()
 
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson")
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+
+
+def get_stream_format(request: Request, stream: bool = False):
+    accept = request.headers.get("accept", "")
+    if any(media_type in accept for media_type in NDJSON_MEDIA_TYPES):
+        return "ndjson"
+    if stream:
+        return "json"
+    return None
+
+
+def get_import_format(request: Request):
+    content_type = request.headers.get("content-type", "")
+    if any(media_type in content_type for media_type in CSV_MEDIA_TYPES):
+        return "csv"
+    if any(media_type in content_type for media_type in NDJSON_MEDIA_TYPES):
+        return "ndjson"
+    raise BadRequestException(message="Upload must be text/csv or application/x-ndjson")
+
+
+def date_range_dependency(default_days: int, max_days: int, forward: bool = False) -> Callable:
+    """Builds a ``start_date``/``end_date`` dependency. Without bounds the range is ``default_days`` long and ends today,
+    or starts today when ``forward``; a single bound extends ``default_days`` from it."""
+
+    def get_date_range(start_date: date = None, end_date: date = None) -> tuple:
+        if forward:
+            start_date = start_date or date.today()
+            end_date = end_date or start_date + timedelta(days=default_days - 1)
+        else:
+            end_date = end_date or date.today()
+            start_date = start_date or end_date - timedelta(days=default_days - 1)
+        if start_date > end_date:
+            raise BadRequestException(message="start_date must not be after end_date")
+        if (end_date - start_date).days >= max_days:
+            raise BadRequestException(message=f"Date range cannot exceed {max_days} days")
+        return start_date, end_date
+
+    return get_date_range
+
 
 async def get_current_user(
         credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
@@ -21,7 +64,7 @@ async def get_current_user(
 ):
     try:
         token = credentials.credentials
-        payload = decode_token(token)
+        payload = decode_token_cached(token)
         email: str = payload.get("sub")
         if email is None:
             raise UnauthorizedException(message="Could not validate credentials")
@@ -30,7 +73,12 @@ async def get_current_user(
     except JWTError:
         raise UnauthorizedException(message="Could not validate credentials")
 
-    user = await get_user_by_email(db=db, email=email)
+    if settings.TOKEN_EMBED_PERMISSIONS and "perms" in payload:
+        if payload.get("pv") != PERMISSIONS_VERSION:
+            raise UnauthorizedException(message="Token permissions are outdated, please login again")
+        return principal_from_claims(payload)
+
+    user = await get_principal_by_email(db=db, email=email)
     if user is None:
         raise UnauthorizedException(message="Could not validate credentials")
     return user
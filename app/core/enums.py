@@ -7,6 +7,42 @@ class Gender(PyEnum):
     OTHER = "OTHER"
 
 
+class ListView(PyEnum):
+    FULL = "full"
+    SUMMARY = "summary"
+
+
+class SortOrder(PyEnum):
+    ASC = "asc"
+    DESC = "desc"
+
+
+class CounterEnum(PyEnum):
+    DOCTORS = "doctors"
+    PATIENTS = "patients"
+    APPOINTMENTS = "appointments"
+    MEDICAL_RECORDS = "medical_records"
+
+
+class RollupMetricEnum(PyEnum):
+    APPOINTMENTS = "appointments"
+    MEDICAL_RECORDS = "medical_records"
+    NEW_PATIENTS = "new_patients"
+
+
+class RollupDimensionEnum(PyEnum):
+    DOCTOR = "doctor"
+    SPECIALTY = "specialty"
+    GENDER = "gender"
+    AGE_BAND = "age_band"
+
+
+class RollupBucketEnum(PyEnum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
 class RoleEnum(PyEnum):
     ADMIN = "ADMIN"
     DOCTOR = "DOCTOR"
@@ -97,3 +133,10 @@ PatientPermissions = [
 
     PermissionsEnum.CAN_VIEW_PATIENT,
 ]
+
+RolePermissionsMap = {
+    RoleEnum.ADMIN: AdminPermissions,
+    RoleEnum.DOCTOR: DoctorPermissions,
+    RoleEnum.RECEPTIONIST: ReceptionistPermissions,
+    RoleEnum.PATIENT: PatientPermissions,
+}
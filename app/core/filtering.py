@@ -0,0 +1,98 @@
+import operator
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import Query
+from pydantic import BaseModel
+
+from app.core.enums import SortOrder
+from app.core.responses import BadRequestException
+
+
+# Scope argument meaning "every row". None stays a real scope (matching nothing), so a doctor or patient principal
+# without a profile id sees an empty list instead of everyone's rows.
+UNSCOPED = object()
+
+
+class ListFilters(BaseModel):
+    """Filters shared by the time-ordered lists; ``start``/``end`` bound the list's time column as [start, end)."""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    doctor_id: Optional[int] = None
+    patient_id: Optional[int] = None
+    sort: SortOrder = SortOrder.ASC
+
+
+class AppointmentFilters(ListFilters):
+    reason: Optional[str] = None
+
+
+class MedicalRecordFilters(ListFilters):
+    pass
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamp columns are naive UTC; an offset in the query string is converted rather than compared as-is.
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _normalize_range(start: Optional[datetime], end: Optional[datetime]) -> tuple:
+    start, end = _naive_utc(start), _naive_utc(end)
+    if start and end and start >= end:
+        raise BadRequestException(message="start must be before end")
+    return start, end
+
+
+def get_medical_record_filters(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        doctor_id: Optional[int] = None,
+        patient_id: Optional[int] = None,
+        sort: SortOrder = SortOrder.ASC,
+) -> MedicalRecordFilters:
+    start, end = _normalize_range(start, end)
+    return MedicalRecordFilters(start=start, end=end, doctor_id=doctor_id, patient_id=patient_id, sort=sort)
+
+
+def get_appointment_filters(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        doctor_id: Optional[int] = None,
+        patient_id: Optional[int] = None,
+        reason: Optional[str] = Query(default=None, min_length=1, max_length=100),
+        sort: SortOrder = SortOrder.ASC,
+) -> AppointmentFilters:
+    start, end = _normalize_range(start, end)
+    return AppointmentFilters(start=start, end=end, doctor_id=doctor_id, patient_id=patient_id, reason=reason,
+                              sort=sort)
+
+
+def escape_like(value: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", value)
+
+
+def contains(column, value: str):
+    return column.ilike(f"%{escape_like(value)}%")
+
+
+def time_range(column) -> dict:
+    """Filter spec entries bounding ``column`` by the ``start``/``end`` filters."""
+    return {"start": (column, operator.ge), "end": (column, operator.lt)}
+
+
+def apply_filters(query, filters: Optional[BaseModel], spec: dict):
+    """Adds a WHERE clause per set filter; ``spec`` maps filter field -> (column, predicate(column, value))."""
+    if filters is None:
+        return query
+    for name, (column, predicate) in spec.items():
+        value = getattr(filters, name)
+        if value is not None:
+            query = query.where(predicate(column, value))
+    return query
+
+
+def is_descending(filters: Optional[ListFilters]) -> bool:
+    return filters is not None and filters.sort == SortOrder.DESC
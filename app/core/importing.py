@@ -0,0 +1,98 @@
+import codecs
+import csv
+from typing import AsyncIterator, Optional
+
+import orjson
+from fastapi import Request
+from pydantic import ValidationError
+
+from app.core.config import settings
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _iter_csv_records(request: Request) -> AsyncIterator[list]:
+    # A record continues onto the next line while it has an unbalanced quote (a newline inside a quoted field).
+    record = None
+    async for line in _iter_lines(request):
+        record = line if record is None else record + "\n" + line
+        if record.count('"') % 2 == 0:
+            if record:
+                yield next(csv.reader([record]))
+            record = None
+    if record:
+        yield next(csv.reader([record]))
+
+
+async def iter_import_rows(request: Request, import_format: str) -> AsyncIterator[tuple]:
+    """Yields ``(row_number, data, error)`` for every data row of the upload, without buffering the body."""
+    row_number = 0
+    if import_format == "csv":
+        header = None
+        async for record in _iter_csv_records(request):
+            if header is None:
+                header = [name.strip() for name in record]
+                continue
+            row_number += 1
+            if len(record) != len(header):
+                yield row_number, None, f"Expected {len(header)} columns, got {len(record)}"
+                continue
+            # Empty cells are nulls, so optional columns can be left blank.
+            yield row_number, {name: value or None for name, value in zip(header, record)}, None
+    else:
+        async for line in _iter_lines(request):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                data = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                yield row_number, None, "Invalid JSON"
+                continue
+            if not isinstance(data, dict):
+                yield row_number, None, "Row must be a JSON object"
+                continue
+            yield row_number, data, None
+
+
+class ImportReport:
+    def __init__(self, max_errors: int = settings.IMPORT_MAX_REPORTED_ERRORS):
+        self.max_errors = max_errors
+        self.total = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row: int, message: str, field: Optional[str] = None):
+        self.add_errors(row, [{"field": field, "message": message}])
+
+    def add_errors(self, row: int, errors: list):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "errors": errors})
+
+    def add_validation_error(self, row: int, error: ValidationError):
+        self.add_errors(row, [
+            {"field": ".".join(str(part) for part in item["loc"]) or None, "message": item["msg"]}
+            for item in error.errors()
+        ])
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "errors_truncated": self.failed > len(self.errors),
+        }
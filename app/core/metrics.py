@@ -0,0 +1,177 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, label_values: tuple = (), amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Gauge(Counter):
+    def dec(self, label_values: tuple = (), amount: float = 1):
+        self.inc(label_values, -amount)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (non-cumulative, last one is +Inf), sum]
+        self.values = {}
+
+    def observe(self, label_values: tuple, value: float):
+        entry = self.values.get(label_values)
+        if entry is None:
+            entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self):
+        for label_values, (counts, total) in self.values.items():
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": str(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+# Set by MetricsMiddleware for the lifetime of each request; SQLAlchemy greenlets inherit it.
+request_stats: ContextVar[RequestStats] = ContextVar("request_stats", default=None)
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+db_statements_per_request = Histogram("db_statements_per_request", "SQL statements executed per request.",
+                                      ("method", "route"), STATEMENT_BUCKETS)
+db_seconds_per_request = Histogram("db_seconds_per_request", "Time spent in SQL statements per request.",
+                                   ("method", "route"))
+db_statements = Counter("db_statements_total", "SQL statements executed, including outside requests.")
+db_seconds = Counter("db_seconds_total", "Time spent in SQL statements, including outside requests.")
+
+REGISTRY = (http_requests, http_request_duration, http_requests_in_flight, db_statements_per_request,
+            db_seconds_per_request, db_statements, db_seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    db_statements.inc()
+    db_seconds.inc(amount=elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute; drop their start time.
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def render_metrics(extra_gauges: dict = None) -> str:
+    """Renders every registered metric, plus ``extra_gauges`` ({name: (help, value)}), in Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        kind = type(metric).__name__.lower()
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {kind}")
+        for name, labels, value in metric.samples():
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{name} {_format_value(value)}")
+    for name, (documentation, value) in (extra_gauges or {}).items():
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _route_template(scope) -> str:
+    # Route templates keep label cardinality bounded; unmatched paths share one label. Newer FastAPI versions
+    # resolve included routers lazily and keep the prefixed template on the effective route context.
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None)
+    if path:
+        return path
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status, in-flight requests and SQL usage per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = RequestStats()
+        token = request_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            request_stats.reset(token)
+            labels = (scope["method"], _route_template(scope))
+            http_requests.inc(labels + (str(status),))
+            http_request_duration.observe(labels, elapsed)
+            db_statements_per_request.observe(labels, stats.statements)
+            db_seconds_per_request.observe(labels, stats.db_seconds)
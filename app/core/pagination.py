@@ -0,0 +1,72 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import Query
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+
+from app.core.config import settings
+from app.core.responses import BadRequestException
+
+
+class PageParams(BaseModel):
+    cursor: Optional[str] = None
+    limit: int
+
+
+def get_page_params(
+        cursor: Optional[str] = None,
+        limit: int = Query(default=settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+) -> PageParams:
+    return PageParams(cursor=cursor, limit=limit)
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    if isinstance(sort_value, (date, datetime)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_column) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        python_type = sort_column.type.python_type
+        if python_type in (date, datetime):
+            sort_value = python_type.fromisoformat(sort_value)
+        elif sort_value is not None:
+            sort_value = python_type(sort_value)
+        return sort_value, int(row_id)
+    except (binascii.Error, TypeError, ValueError):
+        raise BadRequestException(message="Invalid cursor")
+
+
+def order_by_key(query, sort_column, id_column, descending: bool = False):
+    if descending:
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column, id_column)
+
+
+def paginate(query, sort_column, id_column, page: PageParams, descending: bool = False):
+    """Applies keyset pagination over ``(sort_column, id_column)``; fetches one extra row to detect a next page."""
+    if page.cursor:
+        sort_value, row_id = decode_cursor(page.cursor, sort_column)
+        key = tuple_(sort_column, id_column)
+        bound = tuple_(sort_value, row_id)
+        query = query.where(key < bound if descending else key > bound)
+
+    return order_by_key(query, sort_column, id_column, descending).limit(page.limit + 1)
+
+
+def split_page(rows, sort_column, id_column, page: PageParams) -> tuple:
+    rows = list(rows)
+    if len(rows) <= page.limit:
+        return rows, None
+
+    rows = rows[:page.limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
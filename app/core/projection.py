@@ -0,0 +1,3 @@
+def columns_for(model, schema, exclude=()) -> list:
+    """Mapped columns of ``model`` that ``schema`` serializes, so list queries select only what they return."""
+    return [getattr(model, name) for name in schema.model_fields if name not in exclude]
@@ -0,0 +1,111 @@
+import logging
+import re
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, raiseload
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Collapses bind placeholders, expanded IN lists and literals so statements differing only in values share a shape.
+_SHAPE_PATTERNS = (
+    (re.compile(r"\$\d+|%\(\w+\)s|\?"), "?"),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+\b"), "?"),
+    (re.compile(r"\?(?:\s*,\s*\?)+"), "?"),
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryGuardState:
+    def __init__(self, route: str):
+        self.route = route
+        self.statements = 0
+        self.shapes = Counter()
+        self.disabled = False
+        self.reported = set()
+
+
+# Set by QueryGuardMiddleware for the lifetime of each request; SQLAlchemy greenlets inherit it.
+query_guard_state: ContextVar[QueryGuardState] = ContextVar("query_guard_state", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    for pattern, replacement in _SHAPE_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return " ".join(statement.split())
+
+
+def _app_stack() -> str:
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if "/app/" in frame.filename and not frame.filename.endswith("query_guard.py")
+    ]
+    return "".join(traceback.format_list(frames))
+
+
+def _violation(state: QueryGuardState, kind: str, message: str):
+    if kind in state.reported:
+        return
+    state.reported.add(kind)
+    message = f"{state.route}: {message}"
+    if settings.QUERY_GUARD_MODE == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning("%s\n%s", message, _app_stack())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = query_guard_state.get()
+    if state is None or state.disabled:
+        return
+    state.statements += 1
+    if state.statements > settings.QUERY_GUARD_MAX_STATEMENTS:
+        _violation(state, "budget", f"more than {settings.QUERY_GUARD_MAX_STATEMENTS} SQL statements in one request")
+
+    shape = statement_shape(statement)
+    state.shapes[shape] += 1
+    if state.shapes[shape] > settings.QUERY_GUARD_MAX_REPEATS:
+        _violation(state, f"repeat:{shape}", f"statement repeated more than {settings.QUERY_GUARD_MAX_REPEATS} times "
+                                              f"(likely N+1): {shape[:200]}")
+
+
+def _raise_on_lazy_load(orm_execute_state):
+    # Relationships not loaded by the query's own options raise instead of emitting hidden per-row SQL.
+    if orm_execute_state.is_select and not orm_execute_state.is_column_load:
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*", sql_only=True))
+
+
+def install_query_guard(engine):
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Session, "do_orm_execute", _raise_on_lazy_load)
+
+
+async def disable_query_guard():
+    """Route dependency for endpoints that legitimately run many statements, such as bulk imports."""
+    state = query_guard_state.get()
+    if state is not None:
+        state.disabled = True
+
+
+class QueryGuardMiddleware:
+    """Pure ASGI middleware giving each request its own statement budget (see ``QUERY_GUARD_*`` settings)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = query_guard_state.set(QueryGuardState(f"{scope['method']} {scope['path']}"))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            query_guard_state.reset(token)
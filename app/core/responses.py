@@ -1,10 +1,21 @@
 from http import HTTPStatus
 
+import orjson
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic.json import pydantic_encoder
 
 
+def dumps(content) -> bytes:
+    # orjson handles datetimes, enums and UUIDs natively; anything else goes through FastAPI's encoder.
+    return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
 class CustomException(Exception):
     code = HTTPStatus.BAD_GATEWAY
     error_code = HTTPStatus.BAD_GATEWAY
@@ -39,6 +50,12 @@ class UnauthorizedException(CustomException):
     message = HTTPStatus.UNAUTHORIZED.description
 
 
+class ConflictException(CustomException):
+    code = HTTPStatus.CONFLICT
+    error_code = HTTPStatus.CONFLICT
+    message = HTTPStatus.CONFLICT.description
+
+
 class UnprocessableEntity(CustomException):
     code = HTTPStatus.UNPROCESSABLE_ENTITY
     error_code = HTTPStatus.UNPROCESSABLE_ENTITY
@@ -61,10 +78,35 @@ class TokenExpired(CustomException):
 
 class ApiCustomResponse:
     @staticmethod
-    def get_response(data=None, message="Success", status_code=HTTPStatus.OK):
+    def get_response(data=None, message="Success", status_code=HTTPStatus.OK, **meta):
         response_data = {
             "status_code": status_code,
             "message": message,
-            "data": jsonable_encoder(data) if data is not None else []
+            "data": data if data is not None else []
         }
-        return JSONResponse(content=response_data, status_code=status_code)
+        response_data.update(meta)
+        return ORJSONResponse(content=response_data, status_code=status_code)
+
+    @staticmethod
+    def get_streaming_response(rows, ndjson=False, message="Success", status_code=HTTPStatus.OK, chunk_size=500):
+        """Streams an async iterable of dicts as the standard envelope, or as one JSON document per line."""
+
+        async def body():
+            if not ndjson:
+                yield b'{"status_code":%d,"message":%s,"data":[' % (status_code, dumps(message))
+            separator = b"\n" if ndjson else b","
+            chunk = []
+            first = True
+            async for row in rows:
+                chunk.append(dumps(row))
+                if len(chunk) >= chunk_size:
+                    yield (b"" if first or ndjson else b",") + separator.join(chunk) + (b"\n" if ndjson else b"")
+                    first = False
+                    chunk = []
+            if chunk:
+                yield (b"" if first or ndjson else b",") + separator.join(chunk) + (b"\n" if ndjson else b"")
+            if not ndjson:
+                yield b"]}"
+
+        media_type = "application/x-ndjson" if ndjson else "application/json"
+        return StreamingResponse(body(), status_code=status_code, media_type=media_type)
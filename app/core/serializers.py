@@ -0,0 +1,25 @@
+from functools import lru_cache
+from typing import List
+
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+def dump_one(schema, obj) -> dict:
+    """Validates ``obj`` (ORM object or row) against ``schema`` and dumps it straight to JSON-safe types."""
+    adapter = _adapter(schema)
+    return adapter.dump_python(adapter.validate_python(obj, from_attributes=True), mode="json")
+
+
+def dump_many(schema, objs) -> list:
+    adapter = _list_adapter(schema)
+    return adapter.dump_python(adapter.validate_python(list(objs), from_attributes=True), mode="json")
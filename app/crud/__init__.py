@@ -4,3 +4,7 @@ from app.crud import doctor as doctor_crud
 from app.crud import patient as patient_crud
 from app.crud import appointment as appointment_crud
 from app.crud import medical_record as record_crud
+from app.crud import counter as counter_crud
+from app.crud import rollup as rollup_crud
+from app.crud import bulk_import as import_crud
+from app.crud import availability as availability_crud
@@ -1,38 +1,74 @@
+import operator
+from datetime import timedelta
 from typing import Union, List
 
-from sqlalchemy import func
+from sqlalchemy import func, insert, literal, exists
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-
-from app.models import Appointment
+from sqlalchemy.orm import selectinload, aliased, contains_eager
+
+from app.core.database import stream_rows
+from app.core.enums import CounterEnum, RollupMetricEnum
+from app.core.filtering import UNSCOPED, AppointmentFilters, apply_filters, contains, is_descending, time_range
+from app.core.pagination import PageParams, paginate, split_page, order_by_key
+from app.core.projection import columns_for
+from app.core.serializers import dump_one, dump_many
+from app.crud.counter import increment_counter
+from app.crud.rollup import add_activity, move_activity
+from app.models import Appointment, Doctor, Patient
 from app.schema import AppointmentCreate, AppointmentOut, DoctorProfileOut, PatientProfileOut
 
 
 async def get_appointments_count(db: AsyncSession):
-    count = await db.scalar(select(func.count(Appointment.id)))
+    count = await db.scalar(select(func.count(Appointment.id)).where(Appointment.is_deleted == False))
     return count
 
 
-async def list_appointments(db: AsyncSession):
-    result = await db.execute(select(Appointment).where(Appointment.is_deleted == False))
-    return result.scalars().all()
+APPOINTMENT_FILTERS = {
+    **time_range(Appointment.appointment_time),
+    "doctor_id": (Appointment.doctor_id, operator.eq),
+    "patient_id": (Appointment.patient_id, operator.eq),
+    "reason": (Appointment.reason, contains),
+}
+
+
+def _appointments_query(doc_id: int = UNSCOPED, pat_id: int = UNSCOPED, filters: AppointmentFilters = None):
+    query = select(*columns_for(Appointment, AppointmentOut)).where(Appointment.is_deleted == False)
+    if doc_id is not UNSCOPED:
+        query = query.where(Appointment.doctor_id == doc_id)
+    if pat_id is not UNSCOPED:
+        query = query.where(Appointment.patient_id == pat_id)
+    return apply_filters(query, filters, APPOINTMENT_FILTERS)
+
+
+async def _list_appointments_page(db: AsyncSession, query, page: PageParams, filters: AppointmentFilters = None):
+    query = paginate(query, Appointment.appointment_time, Appointment.id, page, descending=is_descending(filters))
+    result = await db.execute(query)
+    return split_page(result.all(), Appointment.appointment_time, Appointment.id, page)
+
+
+async def list_appointments(db: AsyncSession, page: PageParams, filters: AppointmentFilters = None):
+    return await _list_appointments_page(db=db, query=_appointments_query(filters=filters), page=page,
+                                         filters=filters)
 
 
-async def list_doctor_appointments(db: AsyncSession, doc_id: int):
-    result = await db.execute(select(Appointment)
-    .where(
-        Appointment.is_deleted == False, Appointment.doctor_id == doc_id
-    ))
-    return result.scalars().all()
+async def list_doctor_appointments(db: AsyncSession, doc_id: int, page: PageParams,
+                                   filters: AppointmentFilters = None):
+    return await _list_appointments_page(db=db, query=_appointments_query(doc_id=doc_id, filters=filters), page=page,
+                                         filters=filters)
 
 
-async def list_patient_appointments(db: AsyncSession, pat_id: int):
-    result = await db.execute(select(Appointment)
-    .where(
-        Appointment.is_deleted == False, Appointment.patient_id == pat_id
-    ))
-    return result.scalars().all()
+async def list_patient_appointments(db: AsyncSession, pat_id: int, page: PageParams,
+                                    filters: AppointmentFilters = None):
+    return await _list_appointments_page(db=db, query=_appointments_query(pat_id=pat_id, filters=filters), page=page,
+                                         filters=filters)
+
+
+async def stream_appointments(doc_id: int = UNSCOPED, pat_id: int = UNSCOPED, filters: AppointmentFilters = None):
+    query = order_by_key(_appointments_query(doc_id=doc_id, pat_id=pat_id, filters=filters),
+                         Appointment.appointment_time, Appointment.id, descending=is_descending(filters))
+    async for appointment in stream_rows(query):
+        yield dump_one(AppointmentOut, appointment)
 
 
 async def check_appointment_exists(db: AsyncSession, _id: int):
@@ -48,24 +84,60 @@ async def get_appointment_by_id(db: AsyncSession, _id: int):
     return result.scalars().first()
 
 
+def get_end_time(appointment_time, duration_minutes: int):
+    return appointment_time + timedelta(minutes=duration_minutes)
+
+
 async def create_appointment(db: AsyncSession, appointment_data: AppointmentCreate):
-    appointment = Appointment(
-        patient_id=appointment_data.patient_id,
-        doctor_id=appointment_data.doctor_id,
-        appointment_time=appointment_data.appointment_time,
-        reason=appointment_data.reason
+    # INSERT ... SELECT only produces a row when both parties exist and are active; the same statement
+    # returns the new appointment joined to them, so the response needs no further queries.
+    new_appointment = (
+        insert(Appointment)
+        .from_select(
+            ["patient_id", "doctor_id", "appointment_time", "duration_minutes", "end_time", "reason", "is_deleted"],
+            select(
+                literal(appointment_data.patient_id, Appointment.patient_id.type),
+                literal(appointment_data.doctor_id, Appointment.doctor_id.type),
+                literal(appointment_data.appointment_time, Appointment.appointment_time.type),
+                literal(appointment_data.duration_minutes, Appointment.duration_minutes.type),
+                literal(get_end_time(appointment_data.appointment_time, appointment_data.duration_minutes),
+                        Appointment.end_time.type),
+                literal(appointment_data.reason, Appointment.reason.type),
+                literal(False, Appointment.is_deleted.type),
+            ).where(
+                exists().where(Doctor.id == appointment_data.doctor_id, Doctor.is_deleted == False),
+                exists().where(Patient.id == appointment_data.patient_id, Patient.is_deleted == False),
+            )
+        )
+        .returning(*Appointment.__table__.c)
+        .cte("new_appointment")
     )
-    db.add(appointment)
-    await db.commit()
+    appointment = aliased(Appointment, new_appointment)
+    result = await db.execute(
+        select(appointment)
+        .join(appointment.doctor)
+        .join(appointment.patient)
+        .options(contains_eager(appointment.doctor), contains_eager(appointment.patient))
+    )
+    appointment = result.scalars().first()
+    if appointment is None:
+        return None
 
-    appointment = await get_appointment_by_id(db=db, _id=appointment.id)
+    await increment_counter(db, CounterEnum.APPOINTMENTS)
+    await add_activity(db, RollupMetricEnum.APPOINTMENTS, appointment.doctor_id, appointment.patient_id,
+                       appointment.appointment_time)
+    await db.commit()
     return appointment
 
 
 async def update_appointment(db: AsyncSession, appointment: Appointment, updated_data: dict):
+    before = (appointment.doctor_id, appointment.patient_id, appointment.appointment_time)
     for key, value in updated_data.items():
         setattr(appointment, key, value)
+    appointment.end_time = get_end_time(appointment.appointment_time, appointment.duration_minutes)
 
+    await move_activity(db, RollupMetricEnum.APPOINTMENTS, before,
+                        (appointment.doctor_id, appointment.patient_id, appointment.appointment_time))
     await db.commit()
     await db.refresh(appointment)
     return appointment
@@ -73,9 +145,9 @@ async def update_appointment(db: AsyncSession, appointment: Appointment, updated
 
 async def construct_appointment_serialized_response(appointment: Union[Appointment, List[Appointment]]) -> dict:
     if isinstance(appointment, list):
-        final_response = [AppointmentOut.from_orm(apt).dict() for apt in appointment]
+        final_response = dump_many(AppointmentOut, appointment)
     else:
-        final_response = AppointmentOut.from_orm(appointment).dict()
-        final_response["doctor"] = DoctorProfileOut.from_orm(appointment.doctor).dict()
-        final_response["patient"] = PatientProfileOut.from_orm(appointment.patient).dict()
+        final_response = dump_one(AppointmentOut, appointment)
+        final_response["doctor"] = dump_one(DoctorProfileOut, appointment.doctor)
+        final_response["patient"] = dump_one(PatientProfileOut, appointment.patient)
     return final_response
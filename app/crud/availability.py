@@ -0,0 +1,120 @@
+import heapq
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models import Appointment, Doctor
+from app.schema.appointment import MAX_DURATION_MINUTES
+
+
+def working_windows(start_date: date, end_date: date, not_before: datetime = None) -> list:
+    """[start, end) working-hour windows of every working day in the range, skipping time before ``not_before``."""
+    windows = []
+    opens, closes = time(settings.WORKING_DAY_START_HOUR), time(settings.WORKING_DAY_END_HOUR)
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in settings.WORKING_WEEKDAYS:
+            windows.append((datetime.combine(day, opens), datetime.combine(day, closes)))
+        day += timedelta(days=1)
+    if not_before is not None:
+        windows = [(max(start, not_before), end) for start, end in windows if end > not_before]
+    return windows
+
+
+def iter_free_slots(windows: list, busy: list, slot: timedelta):
+    """Yields free [start, end) slots in order, sweeping ``busy`` (sorted by start) once across all windows.
+
+    Slots sit on a grid of ``slot`` from the opening time, so a gap starting mid-slot begins at the next grid point.
+    """
+    index = 0
+    for window_start, window_end in windows:
+        origin = datetime.combine(window_start.date(), time(settings.WORKING_DAY_START_HOUR))
+        while index < len(busy) and busy[index][1] <= window_start:
+            index += 1
+        free_from = window_start
+        position = index
+        while True:
+            if position < len(busy) and busy[position][0] < window_end:
+                busy_start, busy_end = busy[position]
+            else:
+                busy_start = busy_end = window_end
+            candidate = origin - ((origin - free_from) // slot) * slot
+            while candidate + slot <= busy_start:
+                yield candidate, candidate + slot
+                candidate += slot
+            if busy_start >= window_end:
+                break
+            free_from = max(free_from, busy_end)
+            position += 1
+
+
+async def _busy_intervals(db: AsyncSession, doctor_ids: list, start: datetime, end: datetime) -> dict:
+    # Bounding appointment_time on both sides keeps this a range scan of ix_appointment_doctor_time_active.
+    result = await db.execute(
+        select(Appointment.doctor_id, Appointment.appointment_time, Appointment.end_time)
+        .where(
+            Appointment.doctor_id.in_(doctor_ids),
+            Appointment.is_deleted == False,
+            Appointment.appointment_time >= start - timedelta(minutes=MAX_DURATION_MINUTES),
+            Appointment.appointment_time < end,
+            Appointment.end_time > start,
+        )
+        .order_by(Appointment.doctor_id, Appointment.appointment_time)
+    )
+    busy = {doctor_id: [] for doctor_id in doctor_ids}
+    for doctor_id, appointment_start, appointment_end in result.all():
+        busy[doctor_id].append((appointment_start, appointment_end))
+    return busy
+
+
+def _windows_and_bounds(start_date: date, end_date: date):
+    # Appointment times are naive UTC, so the cutoff is too.
+    windows = working_windows(start_date, end_date, not_before=datetime.utcnow().replace(second=0, microsecond=0))
+    if not windows:
+        return windows, None, None
+    return windows, windows[0][0], windows[-1][1]
+
+
+async def get_doctor_availability(db: AsyncSession, doctor_id: int, start_date: date, end_date: date,
+                                  slot_minutes: int, limit: int) -> list:
+    """Earliest ``limit`` free slots of the doctor in the range."""
+    windows, start, end = _windows_and_bounds(start_date, end_date)
+    if not windows:
+        return []
+    busy = await _busy_intervals(db, [doctor_id], start, end)
+    slots = iter_free_slots(windows, busy[doctor_id], timedelta(minutes=slot_minutes))
+    return [{"start": slot_start, "end": slot_end} for slot_start, slot_end in islice(slots, limit)]
+
+
+def _doctor_slots(doctor_id: int, slots):
+    for slot_start, slot_end in slots:
+        yield slot_start, doctor_id, slot_end
+
+
+async def get_specialty_availability(db: AsyncSession, specialty: str, start_date: date, end_date: date,
+                                     slot_minutes: int, limit: int) -> list:
+    """Earliest ``limit`` free slots across all active doctors of ``specialty``, ties broken by doctor id."""
+    windows, start, end = _windows_and_bounds(start_date, end_date)
+    if not windows:
+        return []
+    result = await db.execute(
+        select(Doctor.id)
+        .where(func.lower(Doctor.specialty) == specialty.lower(), Doctor.is_deleted == False)
+        .order_by(Doctor.id)
+    )
+    doctor_ids = result.scalars().all()
+    if not doctor_ids:
+        return []
+
+    busy = await _busy_intervals(db, doctor_ids, start, end)
+    slot = timedelta(minutes=slot_minutes)
+    # Each doctor's slots come out in order, so a lazy k-way merge only computes what the first ``limit`` need.
+    streams = [_doctor_slots(doctor_id, iter_free_slots(windows, busy[doctor_id], slot)) for doctor_id in doctor_ids]
+    return [
+        {"doctor_id": doctor_id, "start": slot_start, "end": slot_end}
+        for slot_start, doctor_id, slot_end in islice(heapq.merge(*streams), limit)
+    ]
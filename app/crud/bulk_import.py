@@ -0,0 +1,287 @@
+from bisect import bisect_left, insort
+from datetime import timedelta
+from functools import partial
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import get_password_hashes_async
+from app.core.config import settings
+from app.core.database import get_driver_connection
+from app.core.enums import CounterEnum, RollupMetricEnum
+from app.core.importing import ImportReport
+from app.crud.counter import increment_counter
+from app.crud.rollup import add_activity_bulk, add_new_patients_bulk
+from app.schema import DoctorCreate, PatientCreate, AppointmentCreate
+
+# Staging tables live for one chunk's transaction; rows are COPYed in and merged with a single statement.
+DOCTOR_STAGING_SQL = text("""
+    CREATE TEMP TABLE import_doctor (
+        row_no integer NOT NULL,
+        email varchar NOT NULL,
+        password varchar NOT NULL,
+        first_name varchar NOT NULL,
+        last_name varchar NOT NULL,
+        specialty varchar NOT NULL,
+        contact_number varchar
+    ) ON COMMIT DROP
+""")
+
+PATIENT_STAGING_SQL = text("""
+    CREATE TEMP TABLE import_patient (
+        row_no integer NOT NULL,
+        email varchar NOT NULL,
+        password varchar NOT NULL,
+        first_name varchar NOT NULL,
+        last_name varchar NOT NULL,
+        date_of_birth date NOT NULL,
+        contact_number varchar,
+        gender varchar NOT NULL
+    ) ON COMMIT DROP
+""")
+
+# Ids are drawn from the appointment sequence while staging, so inserted rows can be matched back to their rows.
+APPOINTMENT_STAGING_SQL = text("""
+    CREATE TEMP TABLE import_appointment (
+        id integer NOT NULL DEFAULT nextval(pg_get_serial_sequence('appointment', 'id')::regclass),
+        row_no integer NOT NULL,
+        patient_id integer NOT NULL,
+        doctor_id integer NOT NULL,
+        appointment_time timestamp NOT NULL,
+        duration_minutes integer NOT NULL,
+        reason varchar
+    ) ON COMMIT DROP
+""")
+
+MERGE_DOCTORS_SQL = text("""
+    WITH new_user AS (
+        INSERT INTO "user" (email, password, role_id, is_deleted)
+        SELECT email, password, :role_id, false FROM import_doctor
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email
+    ), new_doctor AS (
+        INSERT INTO doctor (user_id, first_name, last_name, specialty, contact_number, is_deleted)
+        SELECT nu.id, s.first_name, s.last_name, s.specialty, s.contact_number, false
+        FROM new_user nu JOIN import_doctor s ON s.email = nu.email
+        RETURNING id, user_id
+    )
+    SELECT s.row_no, nd.id
+    FROM import_doctor s
+    LEFT JOIN new_user nu ON nu.email = s.email
+    LEFT JOIN new_doctor nd ON nd.user_id = nu.id
+""")
+
+MERGE_PATIENTS_SQL = text("""
+    WITH new_user AS (
+        INSERT INTO "user" (email, password, role_id, is_deleted)
+        SELECT email, password, :role_id, false FROM import_patient
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email
+    ), new_patient AS (
+        INSERT INTO patient (user_id, first_name, last_name, date_of_birth, contact_number, gender, is_deleted)
+        SELECT nu.id, s.first_name, s.last_name, s.date_of_birth, s.contact_number, s.gender, false
+        FROM new_user nu JOIN import_patient s ON s.email = nu.email
+        RETURNING id, user_id
+    )
+    SELECT s.row_no, np.id
+    FROM import_patient s
+    LEFT JOIN new_user nu ON nu.email = s.email
+    LEFT JOIN new_patient np ON np.user_id = nu.id
+""")
+
+MERGE_APPOINTMENTS_SQL = text("""
+    WITH candidate AS (
+        SELECT s.*, s.appointment_time + s.duration_minutes * interval '1 minute' AS end_time,
+               EXISTS (SELECT 1 FROM doctor d WHERE d.id = s.doctor_id AND d.is_deleted = false) AS doctor_found,
+               EXISTS (SELECT 1 FROM patient p WHERE p.id = s.patient_id AND p.is_deleted = false) AS patient_found
+        FROM import_appointment s
+    ), accepted AS (
+        -- Rows overlapping a booked appointment are rejected up front, so one double booking does not abort
+        -- the whole chunk on the exclusion constraint.
+        SELECT c.* FROM candidate c
+        WHERE c.doctor_found AND c.patient_found
+          AND NOT EXISTS (
+              SELECT 1 FROM appointment a
+              WHERE a.doctor_id = c.doctor_id AND a.is_deleted = false
+                AND tsrange(a.appointment_time, a.end_time, '[)') && tsrange(c.appointment_time, c.end_time, '[)')
+          )
+    ), new_appointment AS (
+        INSERT INTO appointment (id, patient_id, doctor_id, appointment_time, duration_minutes, end_time, reason,
+                                 is_deleted)
+        SELECT id, patient_id, doctor_id, appointment_time, duration_minutes, end_time, reason, false
+        FROM accepted
+        -- The check above is a snapshot; a booking committed since then is skipped here and reported as a
+        -- slot conflict instead of failing the import on the exclusion constraint.
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT c.row_no, na.id, c.doctor_found, c.patient_found
+    FROM candidate c
+    LEFT JOIN new_appointment na ON na.id = c.id
+""")
+
+
+async def _copy_to_staging(db: AsyncSession, staging_sql, table: str, columns: list, records: list):
+    await db.execute(staging_sql)
+    connection = await get_driver_connection(db)
+    await connection.copy_records_to_table(table, records=records, columns=columns)
+
+
+async def _run_import(db: AsyncSession, rows: AsyncIterator[tuple], schema, load_chunk) -> dict:
+    report = ImportReport()
+    chunk = []
+    async for row_no, data, error in rows:
+        report.total += 1
+        if error:
+            report.add_error(row_no, error)
+            continue
+        try:
+            chunk.append((row_no, schema.model_validate(data)))
+        except ValidationError as validation_error:
+            report.add_validation_error(row_no, validation_error)
+            continue
+        if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+            await load_chunk(db, chunk, report)
+            chunk = []
+    if chunk:
+        await load_chunk(db, chunk, report)
+    return report.to_dict()
+
+
+def _drop_duplicate_emails(chunk: list, report: ImportReport, seen_emails: set) -> list:
+    unique = []
+    for row_no, item in chunk:
+        email = item.email.__str__()
+        if email in seen_emails:
+            report.add_error(row_no, "Duplicate email in import", field="email")
+            continue
+        seen_emails.add(email)
+        unique.append((row_no, item))
+    return unique
+
+
+def _collect_user_rows(rows, report: ImportReport) -> list:
+    ids = []
+    for row_no, new_id in rows:
+        if new_id is None:
+            report.add_error(row_no, "User already exists with same email", field="email")
+        else:
+            ids.append(new_id)
+    report.imported += len(ids)
+    return ids
+
+
+async def _load_doctors(db: AsyncSession, chunk: list, report: ImportReport, role_id: int, seen_emails: set):
+    chunk = _drop_duplicate_emails(chunk, report, seen_emails)
+    if not chunk:
+        return
+    passwords = await get_password_hashes_async([item.password for _, item in chunk])
+    records = [
+        (row_no, item.email.__str__(), password, item.first_name, item.last_name, item.specialty, item.contact_number)
+        for (row_no, item), password in zip(chunk, passwords)
+    ]
+    await _copy_to_staging(db, DOCTOR_STAGING_SQL, "import_doctor", [
+        "row_no", "email", "password", "first_name", "last_name", "specialty", "contact_number"
+    ], records)
+    result = await db.execute(MERGE_DOCTORS_SQL, {"role_id": role_id})
+    ids = _collect_user_rows(result.all(), report)
+    await increment_counter(db, CounterEnum.DOCTORS, len(ids))
+    await db.commit()
+
+
+async def _load_patients(db: AsyncSession, chunk: list, report: ImportReport, role_id: int, seen_emails: set):
+    chunk = _drop_duplicate_emails(chunk, report, seen_emails)
+    if not chunk:
+        return
+    passwords = await get_password_hashes_async([item.password for _, item in chunk])
+    records = [
+        (row_no, item.email.__str__(), password, item.first_name, item.last_name, item.date_of_birth,
+         item.contact_number, item.gender.value)
+        for (row_no, item), password in zip(chunk, passwords)
+    ]
+    await _copy_to_staging(db, PATIENT_STAGING_SQL, "import_patient", [
+        "row_no", "email", "password", "first_name", "last_name", "date_of_birth", "contact_number", "gender"
+    ], records)
+    result = await db.execute(MERGE_PATIENTS_SQL, {"role_id": role_id})
+    ids = _collect_user_rows(result.all(), report)
+    await increment_counter(db, CounterEnum.PATIENTS, len(ids))
+    await add_new_patients_bulk(db, ids)
+    await db.commit()
+
+
+def _appointment_slot(item) -> tuple:
+    return item.appointment_time, item.appointment_time + timedelta(minutes=item.duration_minutes)
+
+
+def _overlaps(slots: list, start, end) -> bool:
+    position = bisect_left(slots, (start, end))
+    return (position > 0 and slots[position - 1][1] > start) or (position < len(slots) and slots[position][0] < end)
+
+
+def _split_overlapping_appointments(rows: list, report: ImportReport, booked: dict) -> tuple:
+    """Splits ``rows`` into those that can be loaded now and those overlapping an earlier, still undecided row.
+
+    ``booked`` holds each doctor's (start, end) slots that the database accepted earlier in the import.
+    """
+    ready, deferred, pending = [], [], {}
+    for row_no, item in rows:
+        start, end = _appointment_slot(item)
+        if _overlaps(booked.get(item.doctor_id, []), start, end):
+            report.add_error(row_no, "Overlaps an earlier appointment of this import", field="appointment_time")
+            continue
+        slots = pending.setdefault(item.doctor_id, [])
+        (deferred if _overlaps(slots, start, end) else ready).append((row_no, item))
+        insort(slots, (start, end))
+    return ready, deferred
+
+
+async def _merge_appointments(db: AsyncSession, rows: list, report: ImportReport, booked: dict):
+    records = [
+        (row_no, item.patient_id, item.doctor_id, item.appointment_time, item.duration_minutes, item.reason)
+        for row_no, item in rows
+    ]
+    await _copy_to_staging(db, APPOINTMENT_STAGING_SQL, "import_appointment", [
+        "row_no", "patient_id", "doctor_id", "appointment_time", "duration_minutes", "reason"
+    ], records)
+    result = await db.execute(MERGE_APPOINTMENTS_SQL)
+    items = dict(rows)
+    ids = []
+    for row_no, new_id, doctor_found, patient_found in result.all():
+        if new_id is not None:
+            ids.append(new_id)
+            item = items[row_no]
+            insort(booked.setdefault(item.doctor_id, []), _appointment_slot(item))
+        elif not doctor_found:
+            report.add_error(row_no, "Doctor not found", field="doctor_id")
+        elif not patient_found:
+            report.add_error(row_no, "Patient not found", field="patient_id")
+        else:
+            report.add_error(row_no, "Doctor already has an appointment in this time slot", field="appointment_time")
+    report.imported += len(ids)
+    await increment_counter(db, CounterEnum.APPOINTMENTS, len(ids))
+    await add_activity_bulk(db, RollupMetricEnum.APPOINTMENTS, ids)
+    await db.commit()
+
+
+async def _load_appointments(db: AsyncSession, chunk: list, report: ImportReport, booked: dict):
+    # Rows are booked in file order. A row overlapping an earlier row of the chunk waits for the next round, so it
+    # is only rejected if that earlier row was actually inserted. The first pending row is always ready, so this ends.
+    pending = chunk
+    while pending:
+        ready, pending = _split_overlapping_appointments(pending, report, booked)
+        if ready:
+            await _merge_appointments(db, ready, report, booked)
+
+
+async def import_doctors(db: AsyncSession, rows: AsyncIterator[tuple], role_id: int) -> dict:
+    return await _run_import(db, rows, DoctorCreate, partial(_load_doctors, role_id=role_id, seen_emails=set()))
+
+
+async def import_patients(db: AsyncSession, rows: AsyncIterator[tuple], role_id: int) -> dict:
+    return await _run_import(db, rows, PatientCreate, partial(_load_patients, role_id=role_id, seen_emails=set()))
+
+
+async def import_appointments(db: AsyncSession, rows: AsyncIterator[tuple]) -> dict:
+    return await _run_import(db, rows, AppointmentCreate, partial(_load_appointments, booked={}))
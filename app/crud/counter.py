@@ -0,0 +1,51 @@
+from sqlalchemy import update, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.database import SessionLocal, run_periodically_on_one_worker
+from app.core.enums import CounterEnum
+from app.models import EntityCounter
+
+# One statement so every counter is recomputed from the same snapshot.
+RECONCILE_COUNTERS_SQL = text("""
+    INSERT INTO entity_counter (name, count)
+    SELECT 'doctors', count(*) FROM doctor WHERE is_deleted = false
+    UNION ALL SELECT 'patients', count(*) FROM patient WHERE is_deleted = false
+    UNION ALL SELECT 'appointments', count(*) FROM appointment WHERE is_deleted = false
+    UNION ALL SELECT 'medical_records', count(*) FROM medical_record WHERE is_deleted = false
+    ON CONFLICT (name) DO UPDATE SET count = excluded.count
+""")
+
+
+async def increment_counter(db: AsyncSession, name: CounterEnum, delta: int = 1):
+    # Runs inside the caller's transaction, so the counter commits (or rolls back) with the row it counts.
+    await db.execute(
+        update(EntityCounter).where(EntityCounter.name == name.value).values(count=EntityCounter.count + delta)
+    )
+
+
+async def get_counters(db: AsyncSession) -> dict:
+    result = await db.execute(select(EntityCounter.name, EntityCounter.count))
+    counters = {name.value: 0 for name in CounterEnum}
+    counters.update({name: count for name, count in result.all()})
+    return counters
+
+
+async def reconcile_counters(db: AsyncSession):
+    # Locking the counter rows first waits for in-flight increment_counter transactions to commit and holds back new
+    # ones until this commits, so the recount sees every committed row and no delta is overwritten.
+    await db.execute(select(EntityCounter.name).order_by(EntityCounter.name).with_for_update())
+    await db.execute(RECONCILE_COUNTERS_SQL)
+    await db.commit()
+
+
+async def _reconcile_counters_job():
+    async with SessionLocal() as session:
+        await reconcile_counters(session)
+
+
+async def reconcile_counters_periodically():
+    await run_periodically_on_one_worker(
+        "reconcile_counters", settings.COUNTER_RECONCILE_INTERVAL_SECONDS, _reconcile_counters_job
+    )
@@ -5,18 +5,36 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
+from app.core.database import stream_rows
+from app.core.enums import CounterEnum
+from app.core.pagination import PageParams, paginate, split_page
+from app.core.projection import columns_for
+from app.core.serializers import dump_one, dump_many
+from app.crud.counter import increment_counter
+from app.crud.user import invalidate_principal, build_doctor
 from app.models import Doctor, User
 from app.schema import DoctorProfileOut, UserOut, DoctorCreate, AppointmentOut, MedicalRecordOut
 
 
 async def get_doctors_count(db: AsyncSession):
-    count = await db.scalar(select(func.count(Doctor.id)))
+    count = await db.scalar(select(func.count(Doctor.id)).where(Doctor.is_deleted == False))
     return count
 
 
-async def list_doctors(db: AsyncSession):
-    result = await db.execute(select(Doctor).where(Doctor.is_deleted == False))
-    return result.scalars().all()
+def _doctors_query():
+    return select(*columns_for(Doctor, DoctorProfileOut)).where(Doctor.is_deleted == False)
+
+
+async def list_doctors(db: AsyncSession, page: PageParams):
+    query = paginate(_doctors_query(), Doctor.last_name, Doctor.id, page)
+    result = await db.execute(query)
+    return split_page(result.all(), Doctor.last_name, Doctor.id, page)
+
+
+async def stream_doctors():
+    query = _doctors_query().order_by(Doctor.last_name, Doctor.id)
+    async for doctor in stream_rows(query):
+        yield dump_one(DoctorProfileOut, doctor)
 
 
 async def check_doctor_exists(db: AsyncSession, _id: int):
@@ -37,23 +55,14 @@ async def create_doctor(db: AsyncSession, doctor_data: DoctorCreate, role_id: in
     user = User(
         email=doctor_data.email.__str__(),
         password=doctor_data.password,
-        role_id=role_id
-    )
-    db.add(user)
-    await db.commit()
-
-    doctor = Doctor(
-        first_name=doctor_data.first_name,
-        last_name=doctor_data.last_name,
-        specialty=doctor_data.specialty,
-        contact_number=doctor_data.contact_number,
-        user_id=user.id
+        role_id=role_id,
+        is_deleted=False
     )
+    doctor = build_doctor(user=user, user_create=doctor_data)
     db.add(doctor)
+    await db.flush()
+    await increment_counter(db, CounterEnum.DOCTORS)
     await db.commit()
-    await db.refresh(doctor)
-
-    doctor = await get_doctor_by_id(db=db, _id=doctor.id)
     return doctor
 
 
@@ -63,18 +72,17 @@ async def update_doctor(db: AsyncSession, doctor: Doctor, updated_data: dict):
 
     await db.commit()
     await db.refresh(doctor)
+    invalidate_principal(doctor.user.email)
     return doctor
 
 
 async def construct_doctor_serialized_response(doctor: Union[Doctor, List[Doctor]]) -> dict:
     if isinstance(doctor, list):
-        final_response = [DoctorProfileOut.from_orm(doc).dict() for doc in doctor]
+        final_response = dump_many(DoctorProfileOut, doctor)
     else:
-        final_response = DoctorProfileOut.from_orm(doctor).dict()
-        final_response["user"] = UserOut.from_orm(doctor.user).dict()
+        final_response = dump_one(DoctorProfileOut, doctor)
+        final_response["user"] = dump_one(UserOut, doctor.user)
         # TODO add appointments, and medical Record
-        final_response["appointments"] = [AppointmentOut.from_orm(appointment).dict() for appointment in
-                                          doctor.appointments]
-        final_response["medical_records"] = [MedicalRecordOut.from_orm(record).dict() for record in
-                                             doctor.medical_records]
+        final_response["appointments"] = dump_many(AppointmentOut, doctor.appointments)
+        final_response["medical_records"] = dump_many(MedicalRecordOut, doctor.medical_records)
     return final_response
@@ -1,30 +1,118 @@
+import operator
 from typing import Union, List
 
-from sqlalchemy import func
+from sqlalchemy import REAL, func, insert, literal, literal_column, exists
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-
-from app.models import MedicalRecord
-from app.schema import MedicalRecordCreate, MedicalRecordOut, DoctorProfileOut, PatientProfileOut
+from sqlalchemy.orm import selectinload, aliased, contains_eager
+
+from app.core.config import settings
+from app.core.database import stream_rows
+from app.core.enums import ListView, CounterEnum, RollupMetricEnum
+from app.core.filtering import UNSCOPED, MedicalRecordFilters, apply_filters, is_descending, time_range
+from app.core.pagination import PageParams, paginate, split_page, order_by_key
+from app.core.projection import columns_for
+from app.core.serializers import dump_one, dump_many
+from app.crud.counter import increment_counter
+from app.crud.rollup import add_activity, move_activity
+from app.models import MedicalRecord, Doctor, Patient
+from app.models.medical_record import SEARCH_CONFIG
+from app.schema import MedicalRecordCreate, MedicalRecordOut, MedicalRecordSummaryOut, MedicalRecordSearchOut, \
+    DoctorProfileOut, PatientProfileOut
+
+SEARCH_REGCONFIG = literal_column(f"'{SEARCH_CONFIG}'")
+HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=5"
 
 
 async def get_medical_records_count(db: AsyncSession):
-    count = await db.scalar(select(func.count(MedicalRecord.id)))
+    count = await db.scalar(select(func.count(MedicalRecord.id)).where(MedicalRecord.is_deleted == False))
     return count
 
 
-async def list_all_medical_reocrds(db: AsyncSession):
-    result = await db.execute(select(MedicalRecord).where(MedicalRecord.is_deleted == False))
-    return result.scalars().all()
+def get_medical_record_list_schema(view: ListView = ListView.FULL):
+    # The summary view leaves out the large free-text columns (diagnosis, treatment, notes).
+    return MedicalRecordSummaryOut if view == ListView.SUMMARY else MedicalRecordOut
+
+
+MEDICAL_RECORD_FILTERS = {
+    **time_range(MedicalRecord.visit_date),
+    "doctor_id": (MedicalRecord.doctor_id, operator.eq),
+    "patient_id": (MedicalRecord.patient_id, operator.eq),
+}
+
+
+def _medical_records_query(view: ListView, doc_id: int = UNSCOPED, patient_id: int = None,
+                           filters: MedicalRecordFilters = None):
+    columns = columns_for(MedicalRecord, get_medical_record_list_schema(view))
+    query = select(*columns).where(MedicalRecord.is_deleted == False)
+    if doc_id is not UNSCOPED:
+        query = query.where(MedicalRecord.doctor_id == doc_id)
+    if patient_id is not None:
+        query = query.where(MedicalRecord.patient_id == patient_id)
+    return apply_filters(query, filters, MEDICAL_RECORD_FILTERS)
 
 
-async def list_medical_records_by_doctor_and_patient(db: AsyncSession, doc_id: int, patient_id: int = None):
-    query = select(MedicalRecord).where(MedicalRecord.is_deleted == False, MedicalRecord.doctor_id == doc_id)
-    if patient_id:
-        query.where(MedicalRecord.patient_id == patient_id)
+async def _list_medical_records_page(db: AsyncSession, query, page: PageParams, filters: MedicalRecordFilters = None):
+    query = paginate(query, MedicalRecord.visit_date, MedicalRecord.id, page, descending=is_descending(filters))
     result = await db.execute(query)
-    return result.scalars().all()
+    return split_page(result.all(), MedicalRecord.visit_date, MedicalRecord.id, page)
+
+
+async def list_all_medical_reocrds(db: AsyncSession, page: PageParams, view: ListView = ListView.FULL,
+                                   filters: MedicalRecordFilters = None):
+    query = _medical_records_query(view=view, filters=filters)
+    return await _list_medical_records_page(db=db, query=query, page=page, filters=filters)
+
+
+async def list_medical_records_by_doctor_and_patient(db: AsyncSession, doc_id: int, page: PageParams,
+                                                     patient_id: int = None, view: ListView = ListView.FULL,
+                                                     filters: MedicalRecordFilters = None):
+    query = _medical_records_query(view=view, doc_id=doc_id, patient_id=patient_id, filters=filters)
+    return await _list_medical_records_page(db=db, query=query, page=page, filters=filters)
+
+
+def _search_query(search: str, doc_id: int = UNSCOPED, patient_id: int = None):
+    """Returns (query, rank, id column, tsquery). Ranking runs on the newest ``MEDICAL_RECORD_SEARCH_MAX_CANDIDATES``
+    matches only, so a common term costs a bounded top-N scan instead of ranking and sorting every match."""
+    ts_query = func.websearch_to_tsquery(SEARCH_REGCONFIG, search)
+    candidates = (
+        _medical_records_query(view=ListView.FULL, doc_id=doc_id, patient_id=patient_id)
+        .add_columns(MedicalRecord.search_vector)
+        .where(MedicalRecord.search_vector.bool_op("@@")(ts_query))
+        .order_by(MedicalRecord.visit_date.desc(), MedicalRecord.id.desc())
+        .limit(settings.MEDICAL_RECORD_SEARCH_MAX_CANDIDATES)
+        .subquery("candidates")
+    )
+    rank = func.ts_rank_cd(candidates.c.search_vector, ts_query, type_=REAL).label("rank")
+    query = select(*(column for column in candidates.c if column.key != "search_vector"), rank)
+    return query, rank, candidates.c.id, ts_query
+
+
+async def search_medical_records(db: AsyncSession, search: str, page: PageParams, doc_id: int = UNSCOPED,
+                                 patient_id: int = None):
+    """Records matching the web-style ``search`` query, best match first, each with a highlighted snippet."""
+    query, rank, id_column, ts_query = _search_query(search=search, doc_id=doc_id, patient_id=patient_id)
+    matches = paginate(query, rank, id_column, page, descending=True).subquery("matches")
+    # ts_headline re-parses the whole text, so it only runs on the rows of the page, not on every match.
+    headline = func.ts_headline(
+        SEARCH_REGCONFIG,
+        func.concat_ws(" ", matches.c.diagnosis, matches.c.treatment, matches.c.notes),
+        ts_query,
+        HEADLINE_OPTIONS,
+    ).label("headline")
+    result = await db.execute(
+        select(*matches.c, headline).order_by(matches.c.rank.desc(), matches.c.id.desc())
+    )
+    return split_page(result.all(), rank, id_column, page)
+
+
+async def stream_medical_records(doc_id: int = UNSCOPED, patient_id: int = None, view: ListView = ListView.FULL,
+                                 filters: MedicalRecordFilters = None):
+    schema = get_medical_record_list_schema(view)
+    query = order_by_key(_medical_records_query(view=view, doc_id=doc_id, patient_id=patient_id, filters=filters),
+                         MedicalRecord.visit_date, MedicalRecord.id, descending=is_descending(filters))
+    async for record in stream_rows(query):
+        yield dump_one(schema, record)
 
 
 async def check_medical_record_exists(db: AsyncSession, _id: int):
@@ -41,36 +129,67 @@ async def get_medical_record_by_id(db: AsyncSession, _id: int):
 
 
 async def create_medical_record(db: AsyncSession, record_data: MedicalRecordCreate):
-    medical_record = MedicalRecord(
-        patient_id=record_data.patient_id,
-        doctor_id=record_data.doctor_id,
-        visit_date=record_data.visit_date,
-        diagnosis=record_data.diagnosis,
-        treatment=record_data.treatment,
-        notes=record_data.notes
+    # Same shape as appointment_crud.create_appointment: one statement checks, inserts and returns the joined row.
+    new_record = (
+        insert(MedicalRecord)
+        .from_select(
+            ["patient_id", "doctor_id", "visit_date", "diagnosis", "treatment", "notes", "is_deleted"],
+            select(
+                literal(record_data.patient_id, MedicalRecord.patient_id.type),
+                literal(record_data.doctor_id, MedicalRecord.doctor_id.type),
+                literal(record_data.visit_date, MedicalRecord.visit_date.type),
+                literal(record_data.diagnosis, MedicalRecord.diagnosis.type),
+                literal(record_data.treatment, MedicalRecord.treatment.type),
+                literal(record_data.notes, MedicalRecord.notes.type),
+                literal(False, MedicalRecord.is_deleted.type),
+            ).where(
+                exists().where(Doctor.id == record_data.doctor_id, Doctor.is_deleted == False),
+                exists().where(Patient.id == record_data.patient_id, Patient.is_deleted == False),
+            )
+        )
+        .returning(*MedicalRecord.__table__.c)
+        .cte("new_medical_record")
     )
-    db.add(medical_record)
-    await db.commit()
+    medical_record = aliased(MedicalRecord, new_record)
+    result = await db.execute(
+        select(medical_record)
+        .join(medical_record.doctor)
+        .join(medical_record.patient)
+        .options(contains_eager(medical_record.doctor), contains_eager(medical_record.patient))
+    )
+    medical_record = result.scalars().first()
+    if medical_record is None:
+        return None
 
-    medical_record = await get_medical_record_by_id(db=db, _id=medical_record.id)
+    await increment_counter(db, CounterEnum.MEDICAL_RECORDS)
+    await add_activity(db, RollupMetricEnum.MEDICAL_RECORDS, medical_record.doctor_id, medical_record.patient_id,
+                       medical_record.visit_date)
+    await db.commit()
     return medical_record
 
 
 async def update_medical_record(db: AsyncSession, medical_record: MedicalRecord, updated_data: dict):
+    before = (medical_record.doctor_id, medical_record.patient_id, medical_record.visit_date)
     for key, value in updated_data.items():
         setattr(medical_record, key, value)
 
+    await move_activity(db, RollupMetricEnum.MEDICAL_RECORDS, before,
+                        (medical_record.doctor_id, medical_record.patient_id, medical_record.visit_date))
     await db.commit()
     await db.refresh(medical_record)
     return medical_record
 
 
+def construct_medical_record_search_response(records: list) -> list:
+    return dump_many(MedicalRecordSearchOut, records)
+
+
 async def construct_medical_record_serialized_response(
-        medical_record: Union[MedicalRecord, List[MedicalRecord]]) -> dict:
+        medical_record: Union[MedicalRecord, List[MedicalRecord]], view: ListView = ListView.FULL) -> dict:
     if isinstance(medical_record, list):
-        final_response = [MedicalRecordOut.from_orm(record).dict() for record in medical_record]
+        final_response = dump_many(get_medical_record_list_schema(view), medical_record)
     else:
-        final_response = MedicalRecordOut.from_orm(medical_record).dict()
-        final_response["doctor"] = DoctorProfileOut.from_orm(medical_record.doctor).dict()
-        final_response["patient"] = PatientProfileOut.from_orm(medical_record.patient).dict()
+        final_response = dump_one(MedicalRecordOut, medical_record)
+        final_response["doctor"] = dump_one(DoctorProfileOut, medical_record.doctor)
+        final_response["patient"] = dump_one(PatientProfileOut, medical_record.patient)
     return final_response
@@ -1,30 +1,39 @@
+import re
 from typing import Union, List
 
-from sqlalchemy import func
+from sqlalchemy import and_, case, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
+from app.core.database import stream_rows
+from app.core.enums import CounterEnum
+from app.core.filtering import UNSCOPED, escape_like
+from app.core.pagination import PageParams, paginate, split_page
+from app.core.projection import columns_for
+from app.core.serializers import dump_one, dump_many
+from app.crud.counter import increment_counter
+from app.crud.rollup import add_new_patient
+from app.crud.user import invalidate_principal, build_patient
 from app.models import Patient, User, Appointment
 from app.schema import PatientProfileOut, UserOut, PatientCreate, AppointmentOut, MedicalRecordOut
 
 
 async def get_patients_count(db: AsyncSession):
-    count = await db.scalar(select(func.count(Patient.id)))
+    count = await db.scalar(select(func.count(Patient.id)).where(Patient.is_deleted == False))
     return count
 
 
-async def list_patients(db: AsyncSession, patient_id: int = None):
-    query = select(Patient).where(Patient.is_deleted == False)
-    if patient_id:
+def _patients_query(patient_id: int = UNSCOPED):
+    query = select(*columns_for(Patient, PatientProfileOut)).where(Patient.is_deleted == False)
+    if patient_id is not UNSCOPED:
         query = query.where(Patient.id == patient_id)
-    result = await db.execute(query)
-    return result.scalars().all()
+    return query
 
 
-async def list_patients_assigned_to_doctor(db: AsyncSession, doctor_id: int):
-    stmt = (
-        select(Patient)
+def _patients_assigned_to_doctor_query(doctor_id: int):
+    return (
+        select(*columns_for(Patient, PatientProfileOut))
         .join(Appointment, Appointment.patient_id == Patient.id)
         .where(
             Appointment.doctor_id == doctor_id,
@@ -33,8 +42,85 @@ async def list_patients_assigned_to_doctor(db: AsyncSession, doctor_id: int):
         )
         .distinct()
     )
-    result = await db.execute(stmt)
-    return result.scalars().all()
+
+
+# Trigram (%) matching needs at least one full trigram; shorter terms only match as prefixes.
+TRIGRAM_MIN_LENGTH = 3
+
+
+def _name_term(term: str) -> tuple:
+    prefix = escape_like(term) + "%"
+    is_prefix = or_(Patient.first_name.ilike(prefix), Patient.last_name.ilike(prefix))
+    if len(term) < TRIGRAM_MIN_LENGTH:
+        return is_prefix, case((is_prefix, 1.0), else_=0.0)
+    match = or_(is_prefix, Patient.first_name.op("%")(term), Patient.last_name.op("%")(term))
+    score = case((is_prefix, 1.0), else_=0.0) + func.greatest(func.similarity(Patient.first_name, term),
+                                                              func.similarity(Patient.last_name, term))
+    return match, score
+
+
+def _phone_term(digits: str) -> tuple:
+    match = or_(Patient.contact_digits.like(f"%{digits}%"), Patient.contact_digits.op("%")(digits))
+    score = case((Patient.contact_digits.like(f"{digits}%"), 1.0), else_=0.0) + \
+        func.similarity(Patient.contact_digits, digits)
+    return match, score
+
+
+def _search_terms(search: str) -> list:
+    # Every word with letters must match a first or last name; the remaining words are read together as one phone
+    # number in any format, so "smith 555-0101" and "(555) 010 1" both work.
+    words = [word for word in re.split(r"[\s,]+", search.lower()) if word]
+    names = [word for word in words if re.search(r"[^\W\d_]", word)]
+    digits = "".join(re.sub(r"\D", "", word) for word in words if word not in names)
+    terms = [_name_term(name) for name in names]
+    if digits:
+        terms.append(_phone_term(digits))
+    return terms
+
+
+def _search_patients_query(terms: list, patient_id: int = UNSCOPED, doctor_id: int = UNSCOPED):
+    score = sum((score for _, score in terms[1:]), terms[0][1])
+    query = _patients_query(patient_id=patient_id).where(and_(*(match for match, _ in terms)))
+    if doctor_id is not UNSCOPED:
+        # Same patients as _patients_assigned_to_doctor_query, as a semi-join so no DISTINCT is needed.
+        query = query.where(Patient.id.in_(
+            select(Appointment.patient_id).where(Appointment.doctor_id == doctor_id, Appointment.is_deleted == False)
+        ))
+    return query.order_by(score.desc(), Patient.last_name, Patient.id)
+
+
+async def search_patients(db: AsyncSession, search: str, limit: int, patient_id: int = UNSCOPED,
+                          doctor_id: int = UNSCOPED) -> list:
+    """Best ``limit`` patients for a type-ahead ``search``: prefix matches first, then by trigram similarity."""
+    terms = _search_terms(search)
+    if not terms:
+        return []
+    query = _search_patients_query(terms=terms, patient_id=patient_id, doctor_id=doctor_id)
+    result = await db.execute(query.limit(limit))
+    return result.all()
+
+
+async def _list_patients_page(db: AsyncSession, query, page: PageParams):
+    query = paginate(query, Patient.last_name, Patient.id, page)
+    result = await db.execute(query)
+    return split_page(result.all(), Patient.last_name, Patient.id, page)
+
+
+async def list_patients(db: AsyncSession, page: PageParams, patient_id: int = UNSCOPED):
+    return await _list_patients_page(db=db, query=_patients_query(patient_id=patient_id), page=page)
+
+
+async def list_patients_assigned_to_doctor(db: AsyncSession, doctor_id: int, page: PageParams):
+    return await _list_patients_page(db=db, query=_patients_assigned_to_doctor_query(doctor_id), page=page)
+
+
+async def stream_patients(patient_id: int = UNSCOPED, doctor_id: int = UNSCOPED):
+    if doctor_id is not UNSCOPED:
+        query = _patients_assigned_to_doctor_query(doctor_id)
+    else:
+        query = _patients_query(patient_id=patient_id)
+    async for patient in stream_rows(query.order_by(Patient.last_name, Patient.id)):
+        yield dump_one(PatientProfileOut, patient)
 
 
 async def check_patient_exists(db: AsyncSession, _id: int):
@@ -55,24 +141,15 @@ async def create_patient(db: AsyncSession, patient_data: PatientCreate, role_id:
     user = User(
         email=patient_data.email.__str__(),
         password=patient_data.password,
-        role_id=role_id
-    )
-    db.add(user)
-    await db.commit()
-
-    patient = Patient(
-        first_name=patient_data.first_name,
-        last_name=patient_data.last_name,
-        date_of_birth=patient_data.date_of_birth,
-        contact_number=patient_data.contact_number,
-        gender=patient_data.gender,
-        user_id=user.id
+        role_id=role_id,
+        is_deleted=False
     )
+    patient = build_patient(user=user, user_create=patient_data)
     db.add(patient)
+    await db.flush()
+    await increment_counter(db, CounterEnum.PATIENTS)
+    await add_new_patient(db, patient.gender, patient.date_of_birth)
     await db.commit()
-    await db.refresh(patient)
-
-    patient = await get_patient_by_id(db=db, _id=patient.id)
     return patient
 
 
@@ -82,17 +159,16 @@ async def update_patient(db: AsyncSession, patient: Patient, updated_data: dict)
 
     await db.commit()
     await db.refresh(patient)
+    invalidate_principal(patient.user.email)
     return patient
 
 
 async def construct_patient_serialized_response(patient: Union[Patient, List[Patient]]) -> dict:
     if isinstance(patient, list):
-        final_response = [PatientProfileOut.from_orm(pat).dict() for pat in patient]
+        final_response = dump_many(PatientProfileOut, patient)
     else:
-        final_response = PatientProfileOut.from_orm(patient).dict()
-        final_response["user"] = UserOut.from_orm(patient.user).dict()
-        final_response["appointments"] = [AppointmentOut.from_orm(appointment).dict() for appointment in
-                                          patient.appointments]
-        final_response["medical_records"] = [MedicalRecordOut.from_orm(record).dict() for record in
-                                             patient.medical_records]
+        final_response = dump_one(PatientProfileOut, patient)
+        final_response["user"] = dump_one(UserOut, patient.user)
+        final_response["appointments"] = dump_many(AppointmentOut, patient.appointments)
+        final_response["medical_records"] = dump_many(MedicalRecordOut, patient.medical_records)
     return final_response
@@ -1,10 +1,14 @@
+from sqlalchemy import delete, text, true, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app.core.enums import RoleEnum, PermissionsEnum
-from app.models import Role, User
+from app.core.enums import RoleEnum, PermissionsEnum, RolePermissionsMap
+from app.core.serializers import dump_one
+from app.models import Role, Permission, RolePermission
 from app.schema.role_permission import RoleOut
+from app.schema.user import Principal
 
 
 async def get_role_by_name(db: AsyncSession, role: str):
@@ -12,22 +16,82 @@ async def get_role_by_name(db: AsyncSession, role: str):
     return result.scalars().first()
 
 
+# Roles and their permissions only change through seeding, so they are loaded once per process.
+role_cache = {}
+
+
+async def get_cached_role(db: AsyncSession, role: RoleEnum) -> dict:
+    role_dict = role_cache.get(role)
+    if role_dict is None:
+        result = await db.execute(
+            select(Role)
+            .options(selectinload(Role.role_permissions).selectinload(RolePermission.permission))
+            .where(Role.name == role.value)
+        )
+        role_obj = result.scalars().first()
+        if role_obj is None:
+            return None
+        role_dict = dump_one(RoleOut, role_obj)
+        role_dict["permissions"] = [
+            role_perm.permission.code.value for role_perm in role_obj.role_permissions if role_perm.permission
+        ]
+        role_cache[role] = role_dict
+    return role_dict
+
+
+def clear_role_cache():
+    role_cache.clear()
+
+
+async def sync_roles_permissions(db: AsyncSession):
+    """Makes roles, permissions and their mappings match ``RolePermissionsMap``; safe to run on every start."""
+    pairs = [(role, permission) for role, permissions in RolePermissionsMap.items() for permission in permissions]
+
+    # Serializes concurrent syncs (e.g. several pods starting at once); released on commit.
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('sync_roles_permissions'))"))
+    await db.execute(
+        insert(Role).values([{"name": role} for role in RoleEnum]).on_conflict_do_nothing(index_elements=["name"])
+    )
+    permissions = insert(Permission).values([
+        {"code": permission, "description": permission.value.replace("_", " ").title()}
+        for permission in PermissionsEnum
+    ])
+    await db.execute(permissions.on_conflict_do_update(
+        index_elements=["code"],
+        set_={"description": permissions.excluded.description},
+        where=Permission.description.is_distinct_from(permissions.excluded.description),
+    ))
+    await db.execute(
+        insert(RolePermission)
+        .from_select(
+            ["role_id", "permission_id"],
+            select(Role.id, Permission.id)
+            .join(Permission, true())
+            .where(tuple_(Role.name, Permission.code).in_(pairs)),
+        )
+        .on_conflict_do_nothing(index_elements=["role_id", "permission_id"])
+    )
+    await db.execute(
+        delete(RolePermission)
+        .where(
+            RolePermission.role_id == Role.id,
+            RolePermission.permission_id == Permission.id,
+            tuple_(Role.name, Permission.code).not_in(pairs),
+        )
+    )
+    await db.commit()
+    clear_role_cache()
+
+
 async def get_role_by_name_with_permissions(db: AsyncSession, role: str) -> dict:
     result = await db.execute(select(Role).options(selectinload(Role.role_permissions)).where(Role.name == role))
     role_obj = result.scalars().first()
 
-    role_dict = RoleOut.from_orm(role_obj).dict()
+    role_dict = dump_one(RoleOut, role_obj)
     return role_dict
 
 
-async def check_has_permission(user: User, permission_code: PermissionsEnum):
-    if not user.role or not user.role.role_permissions:
-        return False
-
-    if user.role.name == RoleEnum.ADMIN:
+async def check_has_permission(user: Principal, permission_code: PermissionsEnum):
+    if user.role == RoleEnum.ADMIN:
         return True
-
-    for role_perm in user.role.role_permissions:
-        if role_perm.permission and role_perm.permission.code == permission_code:
-            return True
-    return False
+    return permission_code in user.permissions
@@ -0,0 +1,222 @@
+from datetime import date, datetime
+
+from sqlalchemy import text, func, cast, Date, delete, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.database import SessionLocal, run_periodically_on_one_worker
+from app.core.enums import RollupMetricEnum, RollupDimensionEnum, RollupBucketEnum
+from app.models import AnalyticsRollup
+
+
+def _age_band_sql(day: str) -> str:
+    return f"""
+        CASE
+            WHEN date_part('year', age({day}, p.date_of_birth)) < 18 THEN '0-17'
+            WHEN date_part('year', age({day}, p.date_of_birth)) < 35 THEN '18-34'
+            WHEN date_part('year', age({day}, p.date_of_birth)) < 50 THEN '35-49'
+            WHEN date_part('year', age({day}, p.date_of_birth)) < 65 THEN '50-64'
+            ELSE '65+'
+        END
+    """
+
+
+UPSERT_SQL = "ON CONFLICT (metric, dimension, day, dimension_value) DO UPDATE SET count = analytics_rollup.count + excluded.count"
+
+# One row per dimension for a single appointment / medical record, keyed on the day it happens.
+ADD_ACTIVITY_SQL = text(f"""
+    INSERT INTO analytics_rollup (metric, dimension, day, dimension_value, count)
+    SELECT :metric, v.dimension, CAST(:day AS date), v.dimension_value, :delta
+    FROM doctor d
+    CROSS JOIN patient p
+    CROSS JOIN LATERAL (VALUES
+        ('doctor', CAST(d.id AS varchar)),
+        ('specialty', d.specialty),
+        ('gender', p.gender),
+        ('age_band', {_age_band_sql("CAST(:day AS date)")})
+    ) AS v(dimension, dimension_value)
+    WHERE d.id = :doctor_id AND p.id = :patient_id
+    {UPSERT_SQL}
+""")
+
+ADD_NEW_PATIENT_SQL = text(f"""
+    INSERT INTO analytics_rollup (metric, dimension, day, dimension_value, count)
+    SELECT 'new_patients', v.dimension, CAST(:day AS date), v.dimension_value, 1
+    FROM (VALUES (CAST(:gender AS varchar), CAST(:date_of_birth AS date))) AS p(gender, date_of_birth)
+    CROSS JOIN LATERAL (VALUES
+        ('gender', p.gender),
+        ('age_band', {_age_band_sql("CAST(:day AS date)")})
+    ) AS v(dimension, dimension_value)
+    {UPSERT_SQL}
+""")
+
+
+def _activity_select(metric: RollupMetricEnum, table: str, time_column: str, where: str) -> str:
+    day = f"CAST(r.{time_column} AS date)"
+    return f"""
+        SELECT '{metric.value}' AS metric, v.dimension, {day} AS day, v.dimension_value, count(*) AS count
+        FROM {table} r
+        JOIN doctor d ON d.id = r.doctor_id
+        JOIN patient p ON p.id = r.patient_id
+        CROSS JOIN LATERAL (VALUES
+            ('doctor', CAST(d.id AS varchar)),
+            ('specialty', d.specialty),
+            ('gender', p.gender),
+            ('age_band', {_age_band_sql(day)})
+        ) AS v(dimension, dimension_value)
+        WHERE {where}
+        GROUP BY 1, 2, 3, 4
+    """
+
+
+def _activity_sql(metric: RollupMetricEnum, table: str, time_column: str, where: str) -> str:
+    return f"""
+        INSERT INTO analytics_rollup (metric, dimension, day, dimension_value, count)
+        {_activity_select(metric, table, time_column, where)}
+    """
+
+
+ACTIVITY_SOURCES = {
+    RollupMetricEnum.APPOINTMENTS: ("appointment", "appointment_time"),
+    RollupMetricEnum.MEDICAL_RECORDS: ("medical_record", "visit_date"),
+}
+
+REBUILD_ACTIVITY_SQL = [
+    text(_activity_sql(metric, table, time_column, "r.is_deleted = false"))
+    for metric, (table, time_column) in ACTIVITY_SOURCES.items()
+]
+
+# Deltas land in the bucket of the doctor's and patient's current specialty, gender and date of birth, so editing a
+# profile leaves its earlier activity in the old buckets. Reconciling recomputes each metric and adds the difference
+# to the stored counts; both are read from the same snapshot, and adding (rather than overwriting) keeps the deltas
+# of transactions that commit while the recount runs.
+RECONCILE_ACTIVITY_SQL = [
+    text(f"""
+        WITH fresh AS ({_activity_select(metric, table, time_column, "r.is_deleted = false")}),
+        stored AS (
+            SELECT metric, dimension, day, dimension_value, count FROM analytics_rollup WHERE metric = '{metric.value}'
+        )
+        INSERT INTO analytics_rollup (metric, dimension, day, dimension_value, count)
+        SELECT metric, dimension, day, dimension_value, coalesce(f.count, 0) - coalesce(s.count, 0)
+        FROM fresh f
+        FULL JOIN stored s USING (metric, dimension, day, dimension_value)
+        WHERE coalesce(f.count, 0) <> coalesce(s.count, 0)
+        {UPSERT_SQL}
+    """)
+    for metric, (table, time_column) in ACTIVITY_SOURCES.items()
+]
+
+# Bulk variants keyed on the ids of freshly inserted rows, used by the import endpoints.
+ADD_ACTIVITY_BULK_SQL = {
+    metric: text(_activity_sql(metric, table, time_column, "r.id = ANY(:ids)") + UPSERT_SQL).bindparams(
+        bindparam("ids", type_=ARRAY(Integer))
+    )
+    for metric, (table, time_column) in ACTIVITY_SOURCES.items()
+}
+
+ADD_NEW_PATIENTS_BULK_SQL = text(f"""
+    INSERT INTO analytics_rollup (metric, dimension, day, dimension_value, count)
+    SELECT 'new_patients', v.dimension, CAST(:day AS date), v.dimension_value, count(*)
+    FROM patient p
+    CROSS JOIN LATERAL (VALUES
+        ('gender', p.gender),
+        ('age_band', {_age_band_sql("CAST(:day AS date)")})
+    ) AS v(dimension, dimension_value)
+    WHERE p.id = ANY(:ids)
+    GROUP BY 1, 2, 3, 4
+    {UPSERT_SQL}
+""").bindparams(bindparam("ids", type_=ARRAY(Integer)))
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+async def add_activity(db: AsyncSession, metric: RollupMetricEnum, doctor_id: int, patient_id: int, day,
+                       delta: int = 1):
+    # Runs inside the caller's transaction, like counter_crud.increment_counter.
+    await db.execute(ADD_ACTIVITY_SQL, {
+        "metric": metric.value,
+        "day": _as_date(day),
+        "doctor_id": doctor_id,
+        "patient_id": patient_id,
+        "delta": delta,
+    })
+
+
+async def move_activity(db: AsyncSession, metric: RollupMetricEnum, old: tuple, new: tuple):
+    # old/new are (doctor_id, patient_id, day) before and after an update.
+    old = (old[0], old[1], _as_date(old[2]))
+    new = (new[0], new[1], _as_date(new[2]))
+    if old == new:
+        return
+    await add_activity(db, metric, *old, delta=-1)
+    await add_activity(db, metric, *new)
+
+
+async def add_new_patient(db: AsyncSession, gender: str, date_of_birth: date, day: date = None):
+    # Registrations are events, so soft-deleting a patient later does not take them out of the rollup.
+    await db.execute(ADD_NEW_PATIENT_SQL, {
+        "gender": gender,
+        "date_of_birth": date_of_birth,
+        "day": day or date.today(),
+    })
+
+
+async def add_activity_bulk(db: AsyncSession, metric: RollupMetricEnum, ids: list):
+    if ids:
+        await db.execute(ADD_ACTIVITY_BULK_SQL[metric], {"ids": ids})
+
+
+async def add_new_patients_bulk(db: AsyncSession, ids: list, day: date = None):
+    if ids:
+        await db.execute(ADD_NEW_PATIENTS_BULK_SQL, {"ids": ids, "day": day or date.today()})
+
+
+async def rebuild_activity_rollups(db: AsyncSession):
+    # New patient rollups cannot be rebuilt (patients carry no registration date), so they are left alone.
+    await db.execute(delete(AnalyticsRollup).where(AnalyticsRollup.metric.in_([
+        RollupMetricEnum.APPOINTMENTS.value, RollupMetricEnum.MEDICAL_RECORDS.value
+    ])))
+    for statement in REBUILD_ACTIVITY_SQL:
+        await db.execute(statement)
+    await db.commit()
+
+
+async def reconcile_activity_rollups(db: AsyncSession):
+    for statement in RECONCILE_ACTIVITY_SQL:
+        await db.execute(statement)
+        await db.commit()
+
+
+async def _reconcile_activity_rollups_job():
+    async with SessionLocal() as session:
+        await reconcile_activity_rollups(session)
+
+
+async def reconcile_activity_rollups_periodically():
+    await run_periodically_on_one_worker(
+        "reconcile_activity_rollups", settings.ROLLUP_RECONCILE_INTERVAL_SECONDS, _reconcile_activity_rollups_job
+    )
+
+
+async def get_rollup_series(db: AsyncSession, metric: RollupMetricEnum, dimension: RollupDimensionEnum,
+                            start_date: date, end_date: date, bucket: RollupBucketEnum = RollupBucketEnum.DAY):
+    period = cast(func.date_trunc(bucket.value, AnalyticsRollup.day), Date).label("period")
+    total = func.sum(AnalyticsRollup.count)
+    query = (
+        select(period, AnalyticsRollup.dimension_value, total.label("count"))
+        .where(
+            AnalyticsRollup.metric == metric.value,
+            AnalyticsRollup.dimension == dimension.value,
+            AnalyticsRollup.day >= start_date,
+            AnalyticsRollup.day <= end_date,
+        )
+        .group_by(period, AnalyticsRollup.dimension_value)
+        .having(total != 0)
+        .order_by(period, AnalyticsRollup.dimension_value)
+    )
+    result = await db.execute(query)
+    return [{"period": row.period, "value": row.dimension_value, "count": row.count} for row in result.all()]
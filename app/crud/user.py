@@ -1,11 +1,21 @@
+from typing import Union
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app.core.enums import RoleEnum
-from app.schema import UserCreate, UserOut, RoleOut, DoctorProfileOut, PatientProfileOut
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.enums import RoleEnum, CounterEnum
+from app.core.serializers import dump_one
+from app.crud.counter import increment_counter
+from app.crud.rollup import add_new_patient
+from app.schema import UserCreate, DoctorCreate, PatientCreate, UserOut, RoleOut, DoctorProfileOut, PatientProfileOut, Principal
 from app.models import User, Doctor, Patient, Role, RolePermission
 
+# Authenticated principals keyed by email; entries are immutable snapshots so they never touch a session.
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
 
 async def check_user_exists_by_email(db: AsyncSession, email: str) -> User:
     result = await db.execute(select(User).where(User.email == email, User.is_deleted == False))
@@ -27,62 +37,97 @@ async def get_user_by_email(db: AsyncSession, email: str):
     return user
 
 
-async def create_doctor(db: AsyncSession, user_id: int, user_create: UserCreate) -> Doctor:
-    doctor = Doctor(
+def build_principal(user: User) -> Principal:
+    return Principal(
+        id=user.id,
+        email=user.email,
+        role_id=user.role_id,
+        role=user.role.name,
+        permissions=frozenset(
+            role_perm.permission.code for role_perm in user.role.role_permissions if role_perm.permission
+        ),
+        doctor_id=user.doctor_profile.id if user.doctor_profile else None,
+        patient_id=user.patient_profile.id if user.patient_profile else None,
+    )
+
+
+async def get_principal_by_email(db: AsyncSession, email: str) -> Principal:
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = await get_user_by_email(db=db, email=email)
+        if user is None:
+            return None
+        principal = build_principal(user)
+        principal_cache.set(email, principal)
+    return principal
+
+
+def invalidate_principal(email: str):
+    principal_cache.pop(email)
+
+
+def build_doctor(user: User, user_create: Union[UserCreate, DoctorCreate]) -> Doctor:
+    # Empty collections keep the response from lazy-loading relationships of a row we just inserted.
+    return Doctor(
+        user=user,
         first_name=user_create.first_name,
         last_name=user_create.last_name,
         specialty=user_create.specialty,
         contact_number=user_create.contact_number,
-        user_id=user_id
+        appointments=[],
+        medical_records=[],
     )
-    db.add(doctor)
-    await db.commit()
-    await db.refresh(doctor)
-    return doctor
 
 
-async def create_patient(db: AsyncSession, user_id: int, user_create: UserCreate) -> Patient:
-    patient = Patient(
+def build_patient(user: User, user_create: Union[UserCreate, PatientCreate]) -> Patient:
+    return Patient(
+        user=user,
         first_name=user_create.first_name,
         last_name=user_create.last_name,
         date_of_birth=user_create.date_of_birth,
         contact_number=user_create.contact_number,
         gender=user_create.gender.value,
-        user_id=user_id
+        appointments=[],
+        medical_records=[],
     )
-    db.add(patient)
-    await db.commit()
-    await db.refresh(patient)
-    return patient
 
 
-async def create_user(db: AsyncSession, role_id: int, user_create: UserCreate):
+async def create_user(db: AsyncSession, role: dict, user_create: UserCreate):
     user = User(
-        email=user_create.email,
+        email=user_create.email.__str__(),
         password=user_create.password,
-        role_id=role_id
+        role_id=role["id"],
+        is_deleted=False
     )
     db.add(user)
-    await db.commit()
     if user_create.role == RoleEnum.DOCTOR:
-        doctor = await create_doctor(db=db, user_id=user.id, user_create=user_create)
+        db.add(build_doctor(user=user, user_create=user_create))
+    elif user_create.role == RoleEnum.PATIENT:
+        db.add(build_patient(user=user, user_create=user_create))
+    await db.flush()
+
+    if user_create.role == RoleEnum.DOCTOR:
+        await increment_counter(db, CounterEnum.DOCTORS)
     elif user_create.role == RoleEnum.PATIENT:
-        patient = await create_patient(db=db, user_id=user.id, user_create=user_create)
-    await db.refresh(user)
-    user = await get_user_by_email(db=db, email=user.email)
-    user_response = await construct_user_serialized_response(user)
+        await increment_counter(db, CounterEnum.PATIENTS)
+        await add_new_patient(db, user.patient_profile.gender, user.patient_profile.date_of_birth)
+    await db.commit()
+
+    user_response = await construct_user_serialized_response(user, role=role)
     return user_response
 
 
-async def construct_user_serialized_response(user: User) -> dict:
-    final_response = UserOut.from_orm(user).dict()
-    final_response["role"] = RoleOut.from_orm(user.role).dict()
-    final_response["role"]["permissions"] = []
-    for role_perm in user.role.role_permissions:
-        final_response["role"]["permissions"].append(role_perm.permission.code.value)
+async def construct_user_serialized_response(user: User, role: dict = None) -> dict:
+    final_response = dump_one(UserOut, user)
+    if role is None:
+        role = dump_one(RoleOut, user.role)
+        role["permissions"] = []
+        for role_perm in user.role.role_permissions:
+            role["permissions"].append(role_perm.permission.code.value)
+    final_response["role"] = role
 
-    if user.role.name == RoleEnum.DOCTOR:
-        final_response["doctor_profile"] = DoctorProfileOut.from_orm(user.doctor_profile).dict()
-    elif user.role.name == RoleEnum.PATIENT:
-        final_response["patient_profile"] = PatientProfileOut.from_orm(user.patient_profile).dict()
+    if role["name"] == RoleEnum.DOCTOR.value:
+        final_response["doctor_profile"] = dump_one(DoctorProfileOut, user.doctor_profile)
+    elif role["name"] == RoleEnum.PATIENT.value:
+        final_response["patient_profile"] = dump_one(PatientProfileOut, user.patient_profile)
     return final_response
@@ -1,15 +1,42 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from app.core.config import settings
 from app.core.responses import CustomException
-from app.routers import user, doctor, patient, appointment, medical_record, dashboard
+from app.core.database import SessionLocal, get_pool_stats
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.query_guard import QueryGuardMiddleware
+from app.crud import counter_crud, role_perm_crud, rollup_crud
+from app.routers import user, doctor, patient, appointment, medical_record, dashboard, internal
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.SEED_ON_STARTUP:
+        async with SessionLocal() as session:
+            await role_perm_crud.sync_roles_permissions(session)
+    tasks = []
+    if settings.COUNTER_RECONCILE_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(counter_crud.reconcile_counters_periodically()))
+    if settings.ROLLUP_RECONCILE_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(rollup_crud.reconcile_activity_rollups_periodically()))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
 
 app = FastAPI(
     title="EHR Backend",
     description="Electronic Health Records API with role-based access control",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware (adjust origins as needed)
@@ -21,6 +48,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.QUERY_GUARD_ENABLED:
+    app.add_middleware(QueryGuardMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    # Unauthenticated like any Prometheus target; keep it off the public network.
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        pool = get_pool_stats()
+        content = render_metrics({
+            "db_pool_in_use": ("Connections currently checked out of the pool.", pool["in_use"]),
+            "db_pool_overflow": ("Overflow connections currently open.", pool["overflow"]),
+            "db_pool_checkout_timeouts": ("Pool checkouts that timed out since the process started.", pool["timeouts"]),
+        })
+        return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
+
 
 # Handling standard HTTP exceptions globally
 @app.exception_handler(StarletteHTTPException)
@@ -48,3 +92,4 @@ app.include_router(doctor.router, prefix="/doctor", tags=["Doctor"])
 app.include_router(patient.router, prefix="/patient", tags=["Patient"])
 app.include_router(appointment.router, prefix="/appointment", tags=["Appointment"])
 app.include_router(medical_record.router, prefix="/medical_record", tags=["Medical Record"])
+app.include_router(internal.router, prefix="/internal", tags=["Internal"])
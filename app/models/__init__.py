@@ -4,3 +4,5 @@ from app.models.doctor import Doctor
 from app.models.patient import Patient
 from app.models.appointment import Appointment
 from app.models.medical_record import MedicalRecord
+from app.models.counter import EntityCounter
+from app.models.rollup import AnalyticsRollup
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -6,11 +7,25 @@ from app.core.database import Base
 
 class Appointment(Base):
     __tablename__ = "appointment"
+    __table_args__ = (
+        Index("ix_appointment_time_active", "appointment_time", "id", postgresql_where=text("is_deleted = false")),
+        Index("ix_appointment_doctor_time_active", "doctor_id", "appointment_time", "id",
+              postgresql_where=text("is_deleted = false")),
+        Index("ix_appointment_patient_time_active", "patient_id", "appointment_time", "id",
+              postgresql_where=text("is_deleted = false")),
+        # A doctor cannot have two active appointments whose [start, end) ranges overlap; needs btree_gist.
+        ExcludeConstraint(
+            ("doctor_id", "="), (text("tsrange(appointment_time, end_time, '[)')"), "&&"),
+            name="ex_appointment_doctor_overlap", using="gist", where=text("is_deleted = false"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("patient.id"), nullable=False)
     doctor_id = Column(Integer, ForeignKey("doctor.id"), nullable=False)
     appointment_time = Column(DateTime, nullable=False)
+    duration_minutes = Column(Integer, nullable=False, server_default=text("30"))
+    end_time = Column(DateTime, nullable=False)
     reason = Column(String, nullable=True)
     is_deleted = Column(Boolean, default=False)
 
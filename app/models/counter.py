@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, BigInteger
+
+from app.core.database import Base
+
+
+class EntityCounter(Base):
+    __tablename__ = "entity_counter"
+
+    name = Column(String(50), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
 class Doctor(Base):
     __tablename__ = "doctor"
+    __table_args__ = (
+        Index("ix_doctor_last_name_active", "last_name", "id", postgresql_where=text("is_deleted = false")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False, unique=True)
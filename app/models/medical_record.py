@@ -1,11 +1,29 @@
-from sqlalchemy import Column, Integer, Text, Boolean, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, Text, Boolean, ForeignKey, DateTime, Index, Computed, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from app.core.database import Base
 
+SEARCH_CONFIG = "english"
+# Diagnosis outweighs treatment, which outweighs free-text notes, when search results are ranked.
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, diagnosis), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, treatment), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(notes, '')), 'C')"
+)
+
 
 class MedicalRecord(Base):
     __tablename__ = "medical_record"
+    __table_args__ = (
+        Index("ix_medical_record_visit_active", "visit_date", "id", postgresql_where=text("is_deleted = false")),
+        Index("ix_medical_record_doctor_visit_active", "doctor_id", "visit_date", "id",
+              postgresql_where=text("is_deleted = false")),
+        Index("ix_medical_record_patient_visit_active", "patient_id", "visit_date", "id",
+              postgresql_where=text("is_deleted = false")),
+        Index("ix_medical_record_search_active", "search_vector", postgresql_using="gin",
+              postgresql_where=text("is_deleted = false")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("patient.id"), nullable=False)
@@ -15,6 +33,7 @@ class MedicalRecord(Base):
     treatment = Column(Text, nullable=False)
     notes = Column(Text, nullable=True)
     is_deleted = Column(Boolean, default=False)
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
 
     patient = relationship("Patient", back_populates="medical_records")
     doctor = relationship("Doctor", back_populates="medical_records")
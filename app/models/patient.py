@@ -1,10 +1,22 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, Index, Computed, text
+from sqlalchemy.orm import relationship, deferred
 from app.core.database import Base
 
 
+def _trigram_index(name: str, column: str) -> Index:
+    # Trigram matching is case-insensitive, so the raw columns serve ILIKE prefix and fuzzy (%) lookups alike.
+    return Index(name, column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"},
+                 postgresql_where=text("is_deleted = false"))
+
+
 class Patient(Base):
     __tablename__ = "patient"
+    __table_args__ = (
+        Index("ix_patient_last_name_active", "last_name", "id", postgresql_where=text("is_deleted = false")),
+        _trigram_index("ix_patient_first_name_trgm_active", "first_name"),
+        _trigram_index("ix_patient_last_name_trgm_active", "last_name"),
+        _trigram_index("ix_patient_contact_digits_trgm_active", "contact_digits"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False, unique=True)
@@ -14,6 +26,9 @@ class Patient(Base):
     contact_number = Column(String)
     gender = Column(String, nullable=False)
     is_deleted = Column(Boolean, default=False)
+    # Digits only, so "+1 (555) 010-0101" and "5550100101" match the same search.
+    contact_digits = deferred(Column(String, Computed("regexp_replace(contact_number, '[^0-9]', '', 'g')",
+                                                      persisted=True)))
 
     user = relationship("User", back_populates="patient_profile")
     appointments = relationship("Appointment", back_populates="patient")
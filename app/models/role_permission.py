@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -27,6 +27,9 @@ class Permission(Base):
 
 class RolePermission(Base):
     __tablename__ = "role_permission"
+    __table_args__ = (
+        Index("ux_role_permission_role_permission", "role_id", "permission_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     role_id = Column(Integer, ForeignKey("role.id"), nullable=False)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, BigInteger, Date
+
+from app.core.database import Base
+
+
+class AnalyticsRollup(Base):
+    __tablename__ = "analytics_rollup"
+
+    metric = Column(String(50), primary_key=True)
+    dimension = Column(String(50), primary_key=True)
+    day = Column(Date, primary_key=True)
+    dimension_value = Column(String(100), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
@@ -1,29 +1,49 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.core.dependency import require_permission
-from app.core.enums import PermissionsEnum, RoleEnum
-from app.core.responses import ApiCustomResponse, NotFoundException
-from app.crud import patient_crud, doctor_crud, appointment_crud
+from app.core.database import get_db, get_sqlstate, EXCLUSION_VIOLATION
+from app.core.dependency import require_permission, get_stream_format, get_import_format
+from app.core.enums import PermissionsEnum, RoleEnum, CounterEnum, RollupMetricEnum
+from app.core.filtering import UNSCOPED, AppointmentFilters, get_appointment_filters
+from app.core.importing import iter_import_rows
+from app.core.pagination import PageParams, get_page_params
+from app.core.query_guard import disable_query_guard
+from app.core.responses import ApiCustomResponse, NotFoundException, ConflictException
+from app.crud import doctor_crud, appointment_crud, counter_crud, rollup_crud, import_crud
 from app.schema import AppointmentCreate, AppointmentUpdate
 
 router = APIRouter()
 
+DOUBLE_BOOKING_MESSAGE = "Doctor already has an appointment in this time slot"
+
 
 @router.get("/list")
 async def get_appointments(
+        filters: AppointmentFilters = Depends(get_appointment_filters),
+        page: PageParams = Depends(get_page_params),
+        stream_format: str = Depends(get_stream_format),
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_APPOINTMENT)),
 ):
-    if current_user.role.name == RoleEnum.DOCTOR:
-        appointments = await appointment_crud.list_doctor_appointments(db=db, doc_id=current_user.doctor_profile.id)
-    elif current_user.role.name == RoleEnum.PATIENT:
-        appointments = await appointment_crud.list_patient_appointments(db=db, pat_id=current_user.patient_profile.id)
+    if stream_format:
+        rows = appointment_crud.stream_appointments(
+            doc_id=current_user.doctor_id if current_user.role == RoleEnum.DOCTOR else UNSCOPED,
+            pat_id=current_user.patient_id if current_user.role == RoleEnum.PATIENT else UNSCOPED,
+            filters=filters,
+        )
+        return ApiCustomResponse.get_streaming_response(rows, ndjson=stream_format == "ndjson", message="success")
+
+    if current_user.role == RoleEnum.DOCTOR:
+        appointments, next_cursor = await appointment_crud.list_doctor_appointments(
+            db=db, doc_id=current_user.doctor_id, page=page, filters=filters)
+    elif current_user.role == RoleEnum.PATIENT:
+        appointments, next_cursor = await appointment_crud.list_patient_appointments(
+            db=db, pat_id=current_user.patient_id, page=page, filters=filters)
     else:
-        appointments = await appointment_crud.list_appointments(db=db)
+        appointments, next_cursor = await appointment_crud.list_appointments(db=db, page=page, filters=filters)
     response = await appointment_crud.construct_appointment_serialized_response(appointments)
-    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response, next_cursor=next_cursor)
 
 
 @router.get("/get/{appointment_id}")
@@ -35,7 +55,7 @@ async def get_appointment_by_id(
     appointment = await appointment_crud.get_appointment_by_id(db=db, _id=appointment_id)
     if not appointment:
         raise NotFoundException(message="Appointment not found")
-    response = await appointment_crud.construct_appointment_serialized_response(appointments)
+    response = await appointment_crud.construct_appointment_serialized_response(appointment)
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
 
 
@@ -45,17 +65,32 @@ async def create_appointment(
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_ADD_APPOINTMENT)),
 ):
-    if not await doctor_crud.check_doctor_exists(db=db, _id=appointment.doctor_id):
-        raise NotFoundException(message="Doctor not found")
-
-    if not await patient_crud.check_patient_exists(db=db, _id=appointment.patient_id):
+    try:
+        db_appointment = await appointment_crud.create_appointment(db=db, appointment_data=appointment)
+    except IntegrityError as error:
+        if get_sqlstate(error) == EXCLUSION_VIOLATION:
+            raise ConflictException(message=DOUBLE_BOOKING_MESSAGE)
+        raise
+    if not db_appointment:
+        # Nothing was inserted, so find out which side is missing for the error message.
+        if not await doctor_crud.check_doctor_exists(db=db, _id=appointment.doctor_id):
+            raise NotFoundException(message="Doctor not found")
         raise NotFoundException(message="Patient not found")
-
-    db_appointment = await appointment_crud.create_appointment(db=db, appointment_data=appointment)
     response = await appointment_crud.construct_appointment_serialized_response(db_appointment)
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
 
 
+@router.post("/import", dependencies=[Depends(disable_query_guard)])
+async def import_appointments(
+        request: Request,
+        import_format: str = Depends(get_import_format),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_ADD_APPOINTMENT)),
+):
+    response = await import_crud.import_appointments(db=db, rows=iter_import_rows(request, import_format))
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+
+
 @router.put("/update/{appointment_id}")
 async def update_appointment(
         appointment_id: int,
@@ -67,8 +102,13 @@ async def update_appointment(
     if not db_appointment:
         raise NotFoundException(message="Appointment not found")
 
-    db_appointment = await appointment_crud.update_appointment(db=db, appointment=db_appointment,
-                                                               updated_data=updated_data.dict(exclude_unset=True))
+    try:
+        db_appointment = await appointment_crud.update_appointment(db=db, appointment=db_appointment,
+                                                                   updated_data=updated_data.dict(exclude_unset=True))
+    except IntegrityError as error:
+        if get_sqlstate(error) == EXCLUSION_VIOLATION:
+            raise ConflictException(message=DOUBLE_BOOKING_MESSAGE)
+        raise
     response = await appointment_crud.construct_appointment_serialized_response(db_appointment)
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
 
@@ -84,4 +124,7 @@ async def delete_appointment(
         raise NotFoundException(message="Appointment not found")
 
     db_appointment.is_deleted = True
+    await counter_crud.increment_counter(db, CounterEnum.APPOINTMENTS, -1)
+    await rollup_crud.add_activity(db, RollupMetricEnum.APPOINTMENTS, db_appointment.doctor_id, db_appointment.patient_id,
+                                   db_appointment.appointment_time, -1)
     await db.commit()
@@ -1,29 +1,87 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.dependency import require_permission
-from app.core.enums import PermissionsEnum
-from app.core.responses import ApiCustomResponse
-from app.crud import doctor_crud, patient_crud, appointment_crud, record_crud
+from app.core.dependency import require_permission, date_range_dependency
+from app.core.enums import PermissionsEnum, CounterEnum, RollupMetricEnum, RollupDimensionEnum, RollupBucketEnum
+from app.core.responses import ApiCustomResponse, BadRequestException
+from app.crud import counter_crud, rollup_crud
 
 router = APIRouter()
 
+ACTIVITY_DIMENSIONS = list(RollupDimensionEnum)
+NEW_PATIENT_DIMENSIONS = [RollupDimensionEnum.GENDER, RollupDimensionEnum.AGE_BAND]
+
+
+get_rollup_range = date_range_dependency(settings.ROLLUP_DEFAULT_RANGE_DAYS, settings.ROLLUP_MAX_RANGE_DAYS)
+
+
+async def _get_rollup_response(db: AsyncSession, metric: RollupMetricEnum, group_by: RollupDimensionEnum,
+                               date_range: tuple, bucket: RollupBucketEnum, allowed: list):
+    if group_by not in allowed:
+        raise BadRequestException(message=f"{metric.value} cannot be grouped by {group_by.value}")
+    start_date, end_date = date_range
+    series = await rollup_crud.get_rollup_series(db=db, metric=metric, dimension=group_by, start_date=start_date,
+                                                 end_date=end_date, bucket=bucket)
+    response = {
+        "metric": metric.value,
+        "group_by": group_by.value,
+        "bucket": bucket.value,
+        "start_date": start_date,
+        "end_date": end_date,
+        "series": series,
+    }
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+
 
 @router.get("/summary")
 async def get_summary(
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_STATS)),
 ):
-    doctors = await doctor_crud.get_doctors_count(db=db)
-    patients = await patient_crud.get_patients_count(db=db)
-    appointments = await appointment_crud.get_appointments_count(db=db)
-    medical_records = await record_crud.get_medical_records_count(db=db)
+    counters = await counter_crud.get_counters(db=db)
 
     response = {
-        "total_patients": patients,
-        "total_doctors": doctors,
-        "total_appointments": appointments,
-        "total_medical_records": medical_records,
+        "total_patients": counters[CounterEnum.PATIENTS.value],
+        "total_doctors": counters[CounterEnum.DOCTORS.value],
+        "total_appointments": counters[CounterEnum.APPOINTMENTS.value],
+        "total_medical_records": counters[CounterEnum.MEDICAL_RECORDS.value],
     }
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+
+
+@router.get("/appointments")
+async def get_appointment_rollup(
+        group_by: RollupDimensionEnum = RollupDimensionEnum.DOCTOR,
+        bucket: RollupBucketEnum = RollupBucketEnum.DAY,
+        date_range: tuple = Depends(get_rollup_range),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_STATS)),
+):
+    return await _get_rollup_response(db, RollupMetricEnum.APPOINTMENTS, group_by, date_range, bucket,
+                                      ACTIVITY_DIMENSIONS)
+
+
+@router.get("/medical_records")
+async def get_medical_record_rollup(
+        group_by: RollupDimensionEnum = RollupDimensionEnum.SPECIALTY,
+        bucket: RollupBucketEnum = RollupBucketEnum.DAY,
+        date_range: tuple = Depends(get_rollup_range),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_STATS)),
+):
+    return await _get_rollup_response(db, RollupMetricEnum.MEDICAL_RECORDS, group_by, date_range, bucket,
+                                      ACTIVITY_DIMENSIONS)
+
+
+@router.get("/new_patients")
+async def get_new_patient_rollup(
+        group_by: RollupDimensionEnum = RollupDimensionEnum.GENDER,
+        bucket: RollupBucketEnum = RollupBucketEnum.WEEK,
+        date_range: tuple = Depends(get_rollup_range),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_STATS)),
+):
+    return await _get_rollup_response(db, RollupMetricEnum.NEW_PATIENTS, group_by, date_range, bucket,
+                                      NEW_PATIENT_DIMENSIONS)
@@ -1,25 +1,41 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.auth import get_password_hash
-from app.core.database import get_db
-from app.core.dependency import require_permission
-from app.core.enums import PermissionsEnum, RoleEnum
+from app.core.auth import get_password_hash_async
+from app.core.config import settings
+from app.core.database import get_db, get_sqlstate, UNIQUE_VIOLATION
+from app.core.dependency import require_permission, get_stream_format, get_import_format, date_range_dependency
+from app.core.enums import PermissionsEnum, RoleEnum, CounterEnum
+from app.core.importing import iter_import_rows
+from app.core.pagination import PageParams, get_page_params
+from app.core.query_guard import disable_query_guard
 from app.core.responses import ApiCustomResponse, BadRequestException, NotFoundException
-from app.crud import doctor_crud, user_crud, role_perm_crud
+from app.crud import doctor_crud, user_crud, role_perm_crud, counter_crud, import_crud, availability_crud
 from app.schema import DoctorCreate, DoctorUpdate
+from app.schema.appointment import MAX_DURATION_MINUTES
 
 router = APIRouter()
 
 
+get_availability_range = date_range_dependency(settings.AVAILABILITY_DEFAULT_RANGE_DAYS,
+                                               settings.AVAILABILITY_MAX_RANGE_DAYS, forward=True)
+
+
 @router.get("/list")
 async def get_doctors(
+        page: PageParams = Depends(get_page_params),
+        stream_format: str = Depends(get_stream_format),
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_DOCTOR)),
 ):
-    doctors = await doctor_crud.list_doctors(db=db)
+    if stream_format:
+        rows = doctor_crud.stream_doctors()
+        return ApiCustomResponse.get_streaming_response(rows, ndjson=stream_format == "ndjson", message="success")
+
+    doctors, next_cursor = await doctor_crud.list_doctors(db=db, page=page)
     response = await doctor_crud.construct_doctor_serialized_response(doctors)
-    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response, next_cursor=next_cursor)
 
 
 @router.get("/get/{doctor_id}")
@@ -36,22 +52,85 @@ async def get_doctor_by_id(
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
 
 
+@router.get("/availability")
+async def get_specialty_availability(
+        specialty: str = Query(min_length=1),
+        date_range: tuple = Depends(get_availability_range),
+        slot_minutes: int = Query(default=30, gt=0, le=MAX_DURATION_MINUTES),
+        limit: int = Query(default=settings.AVAILABILITY_DEFAULT_LIMIT, ge=1, le=settings.MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_APPOINTMENT)),
+):
+    start_date, end_date = date_range
+    slots = await availability_crud.get_specialty_availability(db=db, specialty=specialty, start_date=start_date,
+                                                               end_date=end_date, slot_minutes=slot_minutes,
+                                                               limit=limit)
+    response = {
+        "specialty": specialty,
+        "start_date": start_date,
+        "end_date": end_date,
+        "slot_minutes": slot_minutes,
+        "slots": slots,
+    }
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+
+
+@router.get("/{doctor_id}/availability")
+async def get_doctor_availability(
+        doctor_id: int,
+        date_range: tuple = Depends(get_availability_range),
+        slot_minutes: int = Query(default=30, gt=0, le=MAX_DURATION_MINUTES),
+        limit: int = Query(default=settings.AVAILABILITY_DEFAULT_LIMIT, ge=1, le=settings.MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_APPOINTMENT)),
+):
+    if not await doctor_crud.check_doctor_exists(db=db, _id=doctor_id):
+        raise NotFoundException(message="Doctor not found")
+
+    start_date, end_date = date_range
+    slots = await availability_crud.get_doctor_availability(db=db, doctor_id=doctor_id, start_date=start_date,
+                                                            end_date=end_date, slot_minutes=slot_minutes,
+                                                            limit=limit)
+    response = {
+        "doctor_id": doctor_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "slot_minutes": slot_minutes,
+        "slots": slots,
+    }
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+
+
 @router.post("/add")
 async def create_doctor(
         doctor: DoctorCreate,
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_ADD_DOCTOR)),
 ):
-    if await user_crud.check_user_exists_by_email(db=db, email=doctor.email.__str__()):
-        raise BadRequestException(message="User already exists with same email")
-
-    doctor.password = get_password_hash(doctor.password)
-    role = await role_perm_crud.get_role_by_name(db=db, role=RoleEnum.DOCTOR.value)
-    db_doctor = await doctor_crud.create_doctor(db=db, doctor_data=doctor, role_id=role.id)
+    doctor.password = await get_password_hash_async(doctor.password)
+    role = await role_perm_crud.get_cached_role(db=db, role=RoleEnum.DOCTOR)
+    try:
+        db_doctor = await doctor_crud.create_doctor(db=db, doctor_data=doctor, role_id=role["id"])
+    except IntegrityError as error:
+        if get_sqlstate(error) == UNIQUE_VIOLATION:
+            raise BadRequestException(message="User already exists with same email")
+        raise
     response = await doctor_crud.construct_doctor_serialized_response(db_doctor)
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
 
 
+@router.post("/import", dependencies=[Depends(disable_query_guard)])
+async def import_doctors(
+        request: Request,
+        import_format: str = Depends(get_import_format),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_ADD_DOCTOR)),
+):
+    role = await role_perm_crud.get_cached_role(db=db, role=RoleEnum.DOCTOR)
+    response = await import_crud.import_doctors(db=db, rows=iter_import_rows(request, import_format), role_id=role["id"])
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+
+
 @router.put("/update/{doctor_id}")
 async def update_doctor(
         doctor_id: int,
@@ -81,5 +160,7 @@ async def delete_doctor(
 
     db_doctor.is_deleted = True
     db_doctor.user.is_deleted = True
+    await counter_crud.increment_counter(db, CounterEnum.DOCTORS, -1)
     await db.commit()
+    user_crud.invalidate_principal(db_doctor.user.email)
     # return ApiCustomResponse.get_response(status_code=200, message="success", data={"message": "Deleted successfully."})
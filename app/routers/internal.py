@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+
+from app.core.auth import password_hasher, token_cache
+from app.core.database import get_pool_stats
+from app.core.dependency import require_permission
+from app.core.enums import PermissionsEnum
+from app.core.responses import ApiCustomResponse
+from app.crud import user_crud
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def get_stats(
+        current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_STATS)),
+):
+    response = {
+        "db_pool": get_pool_stats(),
+        "principal_cache": user_crud.principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+    }
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.core.dependency import require_permission
-from app.core.enums import PermissionsEnum, RoleEnum
+from app.core.dependency import require_permission, get_stream_format
+from app.core.enums import PermissionsEnum, RoleEnum, CounterEnum, ListView, RollupMetricEnum
+from app.core.filtering import UNSCOPED, MedicalRecordFilters, get_medical_record_filters
+from app.core.pagination import PageParams, get_page_params
 from app.core.responses import ApiCustomResponse, NotFoundException
-from app.crud import patient_crud, doctor_crud, record_crud
+from app.crud import doctor_crud, record_crud, counter_crud, rollup_crud
 from app.schema import MedicalRecordCreate, MedicalRecordUpdate
 
 router = APIRouter()
@@ -13,17 +15,48 @@ router = APIRouter()
 
 @router.get("/list")
 async def get_medical_record(
-        patient_id: int = None,
+        filters: MedicalRecordFilters = Depends(get_medical_record_filters),
+        view: ListView = ListView.FULL,
+        page: PageParams = Depends(get_page_params),
+        stream_format: str = Depends(get_stream_format),
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_RECORD)),
 ):
-    if current_user.role.name == RoleEnum.DOCTOR:
-        medical_records = await record_crud.list_medical_records_by_doctor_and_patient(db=db, patient_id=patient_id,
-                                                                                       doc_id=current_user.doctor_profile.id)
+    if stream_format:
+        rows = record_crud.stream_medical_records(
+            doc_id=current_user.doctor_id if current_user.role == RoleEnum.DOCTOR else UNSCOPED,
+            view=view,
+            filters=filters,
+        )
+        return ApiCustomResponse.get_streaming_response(rows, ndjson=stream_format == "ndjson", message="success")
+
+    if current_user.role == RoleEnum.DOCTOR:
+        medical_records, next_cursor = await record_crud.list_medical_records_by_doctor_and_patient(
+            db=db, doc_id=current_user.doctor_id, page=page, view=view, filters=filters)
     else:
-        medical_records = await record_crud.list_all_medical_reocrds(db=db)
-    response = await record_crud.construct_medical_record_serialized_response(medical_records)
-    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+        medical_records, next_cursor = await record_crud.list_all_medical_reocrds(db=db, page=page, view=view,
+                                                                                  filters=filters)
+    response = await record_crud.construct_medical_record_serialized_response(medical_records, view=view)
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response, next_cursor=next_cursor)
+
+
+@router.get("/search")
+async def search_medical_records(
+        q: str = Query(min_length=1, max_length=200),
+        patient_id: int = None,
+        page: PageParams = Depends(get_page_params),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_RECORD)),
+):
+    medical_records, next_cursor = await record_crud.search_medical_records(
+        db=db,
+        search=q,
+        page=page,
+        doc_id=current_user.doctor_id if current_user.role == RoleEnum.DOCTOR else UNSCOPED,
+        patient_id=patient_id,
+    )
+    response = record_crud.construct_medical_record_search_response(medical_records)
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response, next_cursor=next_cursor)
 
 
 @router.get("/get/{record_id}")
@@ -46,13 +79,12 @@ async def create_medical_record(
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_ADD_RECORD)),
 ):
-    if not await doctor_crud.check_doctor_exists(db=db, _id=record.doctor_id):
-        raise NotFoundException(message="Doctor not found")
-
-    if not await patient_crud.check_patient_exists(db=db, _id=record.patient_id):
-        raise NotFoundException(message="Patient not found")
-
     db_record = await record_crud.create_medical_record(db=db, record_data=record)
+    if not db_record:
+        # Nothing was inserted, so find out which side is missing for the error message.
+        if not await doctor_crud.check_doctor_exists(db=db, _id=record.doctor_id):
+            raise NotFoundException(message="Doctor not found")
+        raise NotFoundException(message="Patient not found")
     response = await record_crud.construct_medical_record_serialized_response(db_record)
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
 
@@ -85,4 +117,7 @@ async def delete_medical_record(
         raise NotFoundException(message="Appointment not found")
 
     db_record.is_deleted = True
+    await counter_crud.increment_counter(db, CounterEnum.MEDICAL_RECORDS, -1)
+    await rollup_crud.add_activity(db, RollupMetricEnum.MEDICAL_RECORDS, db_record.doctor_id, db_record.patient_id,
+                                   db_record.visit_date, -1)
     await db.commit()
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.auth import get_password_hash
-from app.core.database import get_db
-from app.core.dependency import require_permission
-from app.core.enums import PermissionsEnum, RoleEnum
+from app.core.auth import get_password_hash_async
+from app.core.config import settings
+from app.core.database import get_db, get_sqlstate, UNIQUE_VIOLATION
+from app.core.dependency import require_permission, get_stream_format, get_import_format
+from app.core.enums import PermissionsEnum, RoleEnum, CounterEnum
+from app.core.filtering import UNSCOPED
+from app.core.importing import iter_import_rows
+from app.core.pagination import PageParams, get_page_params
+from app.core.query_guard import disable_query_guard
 from app.core.responses import ApiCustomResponse, BadRequestException, NotFoundException
-from app.crud import patient_crud, user_crud, role_perm_crud
+from app.crud import patient_crud, user_crud, role_perm_crud, counter_crud, import_crud
 from app.schema import PatientCreate, PatientUpdate
 
 router = APIRouter()
@@ -14,15 +20,43 @@ router = APIRouter()
 
 @router.get("/list")
 async def get_patients(
+        page: PageParams = Depends(get_page_params),
+        stream_format: str = Depends(get_stream_format),
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_PATIENT)),
 ):
-    if current_user.role.name == RoleEnum.PATIENT:
-        patients = await patient_crud.list_patients(db=db, patient_id=current_user.patient_profile.id)
-    elif current_user.role.name == RoleEnum.DOCTOR:
-        patients = await patient_crud.list_patients_assigned_to_doctor(db=db, doctor_id=current_user.doctor_profile.id)
+    if stream_format:
+        rows = patient_crud.stream_patients(
+            patient_id=current_user.patient_id if current_user.role == RoleEnum.PATIENT else UNSCOPED,
+            doctor_id=current_user.doctor_id if current_user.role == RoleEnum.DOCTOR else UNSCOPED,
+        )
+        return ApiCustomResponse.get_streaming_response(rows, ndjson=stream_format == "ndjson", message="success")
+
+    if current_user.role == RoleEnum.PATIENT:
+        patients, next_cursor = await patient_crud.list_patients(db=db, patient_id=current_user.patient_id, page=page)
+    elif current_user.role == RoleEnum.DOCTOR:
+        patients, next_cursor = await patient_crud.list_patients_assigned_to_doctor(
+            db=db, doctor_id=current_user.doctor_id, page=page)
     else:
-        patients = await patient_crud.list_patients(db=db)
+        patients, next_cursor = await patient_crud.list_patients(db=db, page=page)
+    response = await patient_crud.construct_patient_serialized_response(patients)
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response, next_cursor=next_cursor)
+
+
+@router.get("/search")
+async def search_patients(
+        q: str = Query(min_length=settings.PATIENT_SEARCH_MIN_LENGTH, max_length=100),
+        limit: int = Query(default=settings.PATIENT_SEARCH_DEFAULT_LIMIT, ge=1, le=settings.PATIENT_SEARCH_MAX_LIMIT),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_VIEW_PATIENT)),
+):
+    patients = await patient_crud.search_patients(
+        db=db,
+        search=q.strip(),
+        limit=limit,
+        patient_id=current_user.patient_id if current_user.role == RoleEnum.PATIENT else UNSCOPED,
+        doctor_id=current_user.doctor_id if current_user.role == RoleEnum.DOCTOR else UNSCOPED,
+    )
     response = await patient_crud.construct_patient_serialized_response(patients)
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
 
@@ -47,16 +81,30 @@ async def create_patient(
         db: AsyncSession = Depends(get_db),
         current_user=Depends(require_permission(PermissionsEnum.CAN_ADD_PATIENT)),
 ):
-    if await user_crud.check_user_exists_by_email(db=db, email=patient.email.__str__()):
-        raise BadRequestException(message="User already exists with same email")
-
-    patient.password = get_password_hash(patient.password)
-    role = await role_perm_crud.get_role_by_name(db=db, role=RoleEnum.PATIENT.value)
-    db_patient = await patient_crud.create_patient(db=db, patient_data=patient, role_id=role.id)
+    patient.password = await get_password_hash_async(patient.password)
+    role = await role_perm_crud.get_cached_role(db=db, role=RoleEnum.PATIENT)
+    try:
+        db_patient = await patient_crud.create_patient(db=db, patient_data=patient, role_id=role["id"])
+    except IntegrityError as error:
+        if get_sqlstate(error) == UNIQUE_VIOLATION:
+            raise BadRequestException(message="User already exists with same email")
+        raise
     response = await patient_crud.construct_patient_serialized_response(db_patient)
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
 
 
+@router.post("/import", dependencies=[Depends(disable_query_guard)])
+async def import_patients(
+        request: Request,
+        import_format: str = Depends(get_import_format),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(require_permission(PermissionsEnum.CAN_ADD_PATIENT)),
+):
+    role = await role_perm_crud.get_cached_role(db=db, role=RoleEnum.PATIENT)
+    response = await import_crud.import_patients(db=db, rows=iter_import_rows(request, import_format), role_id=role["id"])
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
+
+
 @router.put("/update/{patient_id}")
 async def update_patient(
         patient_id: int,
@@ -86,4 +134,6 @@ async def delete_patient(
 
     db_patient.is_deleted = True
     db_patient.user.is_deleted = True
+    await counter_crud.increment_counter(db, CounterEnum.PATIENTS, -1)
     await db.commit()
+    user_crud.invalidate_principal(db_patient.user.email)
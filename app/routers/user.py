@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends
 from fastapi.security import HTTPBearer
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.auth import get_password_hash, verify_password, create_access_token
-from app.core.database import get_db
+from app.core.auth import get_password_hash_async, verify_password_async, create_principal_token
+from app.core.database import get_db, get_sqlstate, UNIQUE_VIOLATION
 from app.core.dependency import get_current_user
 from app.core.responses import BadRequestException, UnauthorizedException, ApiCustomResponse
 from app.crud import user_crud, role_perm_crud
@@ -15,26 +16,27 @@ bearer_scheme = HTTPBearer()
 
 @router.post("/register")
 async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    existing_user = await user_crud.check_user_exists_by_email(db, user.email.__str__())
-    if existing_user:
-        raise BadRequestException(message="Email already registered")
-
-    role = await role_perm_crud.get_role_by_name(db=db, role=user.role.value)
+    role = await role_perm_crud.get_cached_role(db=db, role=user.role)
     if role is None:
         raise BadRequestException(message="Invalid role provided.")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     user.password = hashed_password
-    new_user = await user_crud.create_user(db, role_id=role.id, user_create=user)
+    try:
+        new_user = await user_crud.create_user(db, role=role, user_create=user)
+    except IntegrityError as error:
+        if get_sqlstate(error) == UNIQUE_VIOLATION:
+            raise BadRequestException(message="Email already registered")
+        raise
     return ApiCustomResponse.get_response(status_code=200, message="success", data=new_user)
 
 
 @router.post("/login")
 async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
     db_user = await user_crud.get_user_by_email(db, user.email.__str__())
-    if not db_user or not verify_password(user.password, db_user.password):
+    if not db_user or not await verify_password_async(user.password, db_user.password):
         raise UnauthorizedException(message="Invalid credentials")
-    token = create_access_token(data={"sub": db_user.email})
+    token = create_principal_token(user_crud.build_principal(db_user))
     user_response = await user_crud.construct_user_serialized_response(db_user)
     response = {"access_token": token, "user": user_response}
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
@@ -46,5 +48,8 @@ async def get_me(
         db: AsyncSession = Depends(get_db)
 ):
     user_obj = await user_crud.get_user_by_email(db=db, email=user.email)
+    if user_obj is None:
+        # The principal may come from the token or the principal cache, so the user can be gone by now.
+        raise UnauthorizedException(message="Could not validate credentials")
     response = await user_crud.construct_user_serialized_response(user_obj)
     return ApiCustomResponse.get_response(status_code=200, message="success", data=response)
@@ -1,5 +1,6 @@
 from app.schema.user import UserOut, UserLogin, UserCreate, DoctorProfileOut, PatientProfileOut, DoctorCreate, \
-    PatientCreate, DoctorUpdate, PatientUpdate
+    PatientCreate, DoctorUpdate, PatientUpdate, Principal
 from app.schema.role_permission import RoleOut, PermissionBasicOut, RolePermissionCreate, RolePermissionOut, Permission
 from app.schema.appointment import AppointmentOut, AppointmentCreate, AppointmentUpdate
-from app.schema.medical_record import MedicalRecordOut, MedicalRecordUpdate, MedicalRecordCreate
+from app.schema.medical_record import MedicalRecordOut, MedicalRecordUpdate, MedicalRecordCreate, \
+    MedicalRecordSummaryOut, MedicalRecordSearchOut
@@ -3,18 +3,23 @@ from typing import Optional
 
 from pydantic import BaseModel, Field
 
+MAX_DURATION_MINUTES = 24 * 60
+
 
 class AppointmentCreate(BaseModel):
     patient_id: int
     doctor_id: int
     appointment_time: datetime = Field(..., example="2025-07-14 10:45:05")
+    duration_minutes: int = Field(default=30, gt=0, le=MAX_DURATION_MINUTES)
     reason: Optional[str]
 
 
 class AppointmentUpdate(BaseModel):
-    patient_id: Optional[int] = None
-    doctor_id: Optional[int] = None
-    appointment_time: Optional[datetime] = Field(default=None, example="2025-07-14 10:45:05")
+    # Omitted fields stay unchanged; the non-Optional ones reject an explicit null (defaults are not validated).
+    patient_id: int = None
+    doctor_id: int = None
+    appointment_time: datetime = Field(default=None, example="2025-07-14 10:45:05")
+    duration_minutes: int = Field(default=None, gt=0, le=MAX_DURATION_MINUTES)
     reason: Optional[str] = None
 
 
@@ -23,6 +28,8 @@ class AppointmentOut(BaseModel):
     patient_id: int
     doctor_id: int
     appointment_time: datetime
+    duration_minutes: int
+    end_time: datetime
     reason: Optional[str]
     is_deleted: bool
 
@@ -22,6 +22,17 @@ class MedicalRecordUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+class MedicalRecordSummaryOut(BaseModel):
+    id: int
+    patient_id: int
+    doctor_id: int
+    visit_date: datetime
+    is_deleted: bool
+
+    class Config:
+        from_attributes = True
+
+
 class MedicalRecordOut(BaseModel):
     id: int
     patient_id: int
@@ -34,3 +45,8 @@ class MedicalRecordOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class MedicalRecordSearchOut(MedicalRecordOut):
+    rank: float
+    headline: str
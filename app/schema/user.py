@@ -3,7 +3,7 @@ from typing import Optional
 
 from pydantic import BaseModel, EmailStr, model_validator, Field
 
-from app.core.enums import RoleEnum, Gender
+from app.core.enums import RoleEnum, Gender, PermissionsEnum
 
 
 class DoctorCreate(BaseModel):
@@ -112,3 +112,16 @@ class UserOut(BaseModel):
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
+
+
+class Principal(BaseModel):
+    id: int
+    email: str
+    role_id: int
+    role: RoleEnum
+    permissions: frozenset[PermissionsEnum]
+    doctor_id: Optional[int] = None
+    patient_id: Optional[int] = None
+
+    class Config:
+        frozen = True
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+
+class Case:
+    def __init__(self, name: str, func, is_async: bool = False, min_time: float = 0.2):
+        self.name = name
+        self.func = func
+        self.is_async = is_async
+        self.min_time = min_time
+
+
+def _time_calls(case: Case, number: int, loop) -> float:
+    if case.is_async:
+        async def run():
+            started = time.perf_counter()
+            for _ in range(number):
+                await case.func()
+            return time.perf_counter() - started
+        return loop.run_until_complete(run())
+
+    func = case.func
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def measure(case: Case, rounds: int, loop) -> dict:
+    # Calibrate the calls per round so a round takes at least ``min_time``, then keep the per-call time of each round.
+    number = 1
+    while True:
+        elapsed = _time_calls(case, number, loop)
+        if elapsed >= case.min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * case.min_time / max(elapsed, 1e-9) * 1.2))
+
+    per_call = [elapsed / number]
+    for _ in range(rounds - 1):
+        per_call.append(_time_calls(case, number, loop) / number)
+    per_call_us = [seconds * 1e6 for seconds in per_call]
+    median = statistics.median(per_call_us)
+    return {
+        "median_us": round(median, 3),
+        "min_us": round(min(per_call_us), 3),
+        "stdev_us": round(statistics.stdev(per_call_us), 3) if len(per_call_us) > 1 else 0.0,
+        "ops_per_sec": round(1e6 / median, 1) if median else None,
+        "calls_per_round": number,
+        "rounds": rounds,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_cases(cases: list, rounds: int) -> dict:
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for case in cases:
+            results[case.name] = measure(case, rounds, loop)
+            print(f"{case.name:<58}{results[case.name]['median_us']:>14.2f} us")
+    finally:
+        loop.close()
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Prints current vs baseline medians and returns the names of cases slower than ``1 + tolerance`` times."""
+    regressions = []
+    print(f"\n{'case':<58}{'baseline us':>14}{'current us':>14}{'ratio':>9}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<58}{'-':>14}{result['median_us']:>14.2f}{'new':>9}")
+            continue
+        ratio = result["median_us"] / before["median_us"] if before["median_us"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<58}{before['median_us']:>14.2f}{result['median_us']:>14.2f}{ratio:>8.2f}x{flag}")
+    return regressions
+
+
+def load_json(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_json(path: str, content: dict):
+    with open(path, "w") as file:
+        json.dump(content, file, indent=2, sort_keys=True)
+        file.write("\n")
@@ -0,0 +1,67 @@
+"""Per-row cost of serializing list responses: legacy from_orm().dict() + jsonable_encoder vs dump_many + orjson.
+
+Run with ``python -m benchmarks.serialization [rows ...]``; only transient ORM objects are used, no database needed.
+"""
+import sys
+import timeit
+import warnings
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.responses import ApiCustomResponse
+from app.core.serializers import dump_many
+from app.models import Appointment, MedicalRecord
+from app.schema import AppointmentOut, MedicalRecordOut
+
+
+def make_appointments(count: int):
+    start = datetime(2025, 1, 1, 9)
+    return [
+        Appointment(id=i, patient_id=i % 997, doctor_id=i % 53, appointment_time=start + timedelta(minutes=15 * i),
+                    duration_minutes=15, end_time=start + timedelta(minutes=15 * i + 15), reason="Follow-up visit",
+                    is_deleted=False)
+        for i in range(count)
+    ]
+
+
+def make_medical_records(count: int):
+    start = datetime(2025, 1, 1, 9)
+    return [
+        MedicalRecord(id=i, patient_id=i % 997, doctor_id=i % 53, visit_date=start + timedelta(hours=i),
+                      diagnosis="Hypertension, stage 1", treatment="Lisinopril 10mg daily",
+                      notes="Patient reports occasional headaches. " * 8, is_deleted=False)
+        for i in range(count)
+    ]
+
+
+def legacy(schema, rows):
+    data = [schema.from_orm(row).dict() for row in rows]
+    content = {"status_code": 200, "message": "success", "data": jsonable_encoder(data)}
+    return JSONResponse(content=content).body
+
+
+def fast(schema, rows):
+    return ApiCustomResponse.get_response(status_code=200, message="success", data=dump_many(schema, rows)).body
+
+
+def per_row_us(func, schema, rows, repeat: int = 5) -> float:
+    number = max(1, 20000 // len(rows))
+    best = min(timeit.repeat(lambda: func(schema, rows), number=number, repeat=repeat))
+    return best / number / len(rows) * 1e6
+
+
+def main(sizes):
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    print(f"{'schema':<18}{'rows':>8}{'legacy us/row':>16}{'fast us/row':>14}{'speedup':>10}")
+    for schema, factory in ((AppointmentOut, make_appointments), (MedicalRecordOut, make_medical_records)):
+        for size in sizes:
+            rows = factory(size)
+            before = per_row_us(legacy, schema, rows)
+            after = per_row_us(fast, schema, rows)
+            print(f"{schema.__name__:<18}{size:>8}{before:>16.2f}{after:>14.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1, 100, 10000])
@@ -0,0 +1,224 @@
+"""Micro-benchmarks for the request hot paths, with JSON results and a baseline comparison.
+
+Serialization, permission checks, response rendering, tokens and password hashing run on transient ORM objects
+and need no database. ``get_user_by_email`` / ``get_principal_by_email`` run against the database configured in
+``.env`` and are skipped when it cannot be reached (or with ``--no-db``). Single-object cases use the detail form
+of each ``construct_*_serialized_response``, larger sizes the list form.
+
+    python -m benchmarks.suite --output results.json --save-baseline      # on the main branch
+    python -m benchmarks.suite --output results.json                      # on a feature branch
+
+Comparing against ``--baseline`` (default ``benchmarks/baseline.json``) exits with status 1 when any case's median
+is more than ``--tolerance`` slower. Baselines are machine specific, so record and compare on the same host.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import warnings
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from app.core.auth import get_password_hash, verify_password, create_access_token, decode_token, \
+    decode_token_cached, create_principal_token, principal_from_claims
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.enums import RoleEnum, PermissionsEnum, RolePermissionsMap
+from app.core.responses import ApiCustomResponse
+from app.crud.appointment import construct_appointment_serialized_response
+from app.crud.doctor import construct_doctor_serialized_response
+from app.crud.medical_record import construct_medical_record_serialized_response
+from app.crud.patient import construct_patient_serialized_response
+from app.crud.role_perm import check_has_permission
+from app.crud.user import construct_user_serialized_response, get_user_by_email, get_principal_by_email, \
+    build_principal, principal_cache
+from app.models import User, Doctor, Patient, Role, Permission, RolePermission
+from app.schema import Principal
+from benchmarks.runner import Case, run_cases, compare, load_json, write_json
+from benchmarks.serialization import make_appointments, make_medical_records
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SIZES = (1, 100, 10_000)
+
+
+def make_doctors(count: int):
+    return [
+        Doctor(id=i, user_id=i, first_name="Gregory", last_name=f"House{i}", specialty="Diagnostics",
+               contact_number="+15550100", is_deleted=False)
+        for i in range(count)
+    ]
+
+
+def make_patients(count: int):
+    return [
+        Patient(id=i, user_id=i, first_name="Jane", last_name=f"Doe{i}", date_of_birth=date(1980, 1, 1) + timedelta(i),
+                contact_number="+15550199", gender="FEMALE", is_deleted=False)
+        for i in range(count)
+    ]
+
+
+def make_user(role_name: RoleEnum) -> User:
+    role = Role(id=1, name=role_name)
+    role.role_permissions = [
+        RolePermission(id=i, role_id=1, permission_id=i, permission=Permission(id=i, code=code))
+        for i, code in enumerate(sorted(RolePermissionsMap[role_name], key=lambda code: code.value))
+    ]
+    user = User(id=1, email="doctor@example.com", password="x", role_id=1, role=role, is_deleted=False)
+    user.doctor_profile = make_doctors(1)[0]
+    user.patient_profile = None
+    return user
+
+
+def _with_details(profile, user: User):
+    # Detail responses include the profile's user and, typically, a page worth of related rows.
+    profile.user = user
+    profile.appointments = make_appointments(20)
+    profile.medical_records = make_medical_records(20)
+    return profile
+
+
+def _sync(coroutine_function, *args):
+    # The construct_* helpers are coroutines that never await; drive them without an event loop round trip.
+    def call():
+        coroutine = coroutine_function(*args)
+        try:
+            coroutine.send(None)
+        except StopIteration as result:
+            return result.value
+        raise RuntimeError(f"{coroutine_function.__name__} awaited unexpectedly")
+    return call
+
+
+def serialization_cases() -> list:
+    user = make_user(RoleEnum.DOCTOR)
+    cases = [Case("construct_user_serialized_response[1]", _sync(construct_user_serialized_response, user))]
+    factories = (
+        (construct_doctor_serialized_response, make_doctors),
+        (construct_patient_serialized_response, make_patients),
+        (construct_appointment_serialized_response, make_appointments),
+        (construct_medical_record_serialized_response, make_medical_records),
+    )
+    for construct, factory in factories:
+        for size in SIZES:
+            if size == 1:
+                row = factory(1)[0]
+                if isinstance(row, (Doctor, Patient)):
+                    _with_details(row, user)
+                else:
+                    row.doctor = make_doctors(1)[0]
+                    row.patient = make_patients(1)[0]
+                cases.append(Case(f"{construct.__name__}[1]", _sync(construct, row)))
+            else:
+                cases.append(Case(f"{construct.__name__}[{size}]", _sync(construct, factory(size))))
+
+    for size in SIZES:
+        data = _sync(construct_appointment_serialized_response, make_appointments(size))()
+        cases.append(Case(f"ApiCustomResponse.get_response[{size}]",
+                          lambda data=data: ApiCustomResponse.get_response(status_code=200, message="success",
+                                                                           data=data)))
+    return cases
+
+
+def auth_cases(hash_rounds: bool) -> list:
+    principal = build_principal(make_user(RoleEnum.DOCTOR))
+    admin = Principal(id=2, email="admin@example.com", role_id=2, role=RoleEnum.ADMIN, permissions=frozenset())
+    token = create_access_token({"sub": principal.email})
+    principal_token = create_principal_token(principal)
+    cases = [
+        Case("check_has_permission[granted]", _sync(check_has_permission, principal, PermissionsEnum.CAN_VIEW_PATIENT)),
+        Case("check_has_permission[denied]", _sync(check_has_permission, principal, PermissionsEnum.CAN_ADD_DOCTOR)),
+        Case("check_has_permission[admin]", _sync(check_has_permission, admin, PermissionsEnum.CAN_ADD_DOCTOR)),
+        Case("create_access_token", lambda: create_access_token({"sub": principal.email})),
+        Case("create_principal_token", lambda: create_principal_token(principal)),
+        Case("decode_token", lambda: decode_token(token)),
+        Case("decode_token_cached[hit]", lambda: decode_token_cached(token)),
+    ]
+    if settings.TOKEN_EMBED_PERMISSIONS:
+        cases.append(Case("principal_from_claims", lambda: principal_from_claims(decode_token_cached(principal_token))))
+    if hash_rounds:
+        hashed = get_password_hash("benchmark-password")
+        cases += [
+            Case("get_password_hash", lambda: get_password_hash("benchmark-password"), min_time=0),
+            Case("verify_password", lambda: verify_password("benchmark-password", hashed), min_time=0),
+        ]
+    return cases
+
+
+async def _first_active_email():
+    async with SessionLocal() as session:
+        result = await session.execute(text('SELECT email FROM "user" WHERE is_deleted = false ORDER BY id LIMIT 1'))
+        return result.scalar()
+
+
+def database_cases(email: str) -> list:
+
+    async def user_by_email():
+        async with SessionLocal() as session:
+            await get_user_by_email(session, email)
+
+    async def principal_by_email(cold: bool):
+        if cold:
+            principal_cache.pop(email)
+        async with SessionLocal() as session:
+            await get_principal_by_email(session, email)
+
+    return [
+        Case("get_user_by_email", user_by_email, is_async=True),
+        Case("get_principal_by_email[miss]", lambda: principal_by_email(True), is_async=True),
+        Case("get_principal_by_email[hit]", lambda: principal_by_email(False), is_async=True),
+    ]
+
+
+def _resolve_email(email: str) -> str:
+    loop = asyncio.new_event_loop()
+    try:
+        return email or loop.run_until_complete(_first_active_email())
+    except Exception as error:
+        print(f"Skipping database cases: {error.__class__.__name__}: {error}", file=sys.stderr)
+        return None
+    finally:
+        loop.run_until_complete(engine.dispose())
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the micro-benchmark suite.")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before failing, e.g. 0.2")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per case")
+    parser.add_argument("--filter", help="Only run cases whose name matches this regular expression")
+    parser.add_argument("--email", help="User looked up by the database cases (default: first active user)")
+    parser.add_argument("--no-db", action="store_true", help="Skip the cases that need the database")
+    parser.add_argument("--no-hash", action="store_true", help="Skip the (slow) bcrypt cases")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    cases = serialization_cases() + auth_cases(not args.no_hash)
+    if not args.no_db:
+        email = _resolve_email(args.email)
+        if email:
+            cases += database_cases(email)
+    if args.filter:
+        cases = [case for case in cases if re.search(args.filter, case.name)]
+
+    results = run_cases(cases, args.rounds)
+    if args.output:
+        write_json(args.output, results)
+
+    regressions = []
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"\nBaseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        regressions = compare(results, load_json(args.baseline), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Asserts that the hot list/lookup queries can be served by an index instead of a sequential scan.
+
+Sequential scans are disabled for the duration of the check, so on a small development database the planner still
+picks an index whenever one matches the query shape; a remaining ``Seq Scan`` means no index covers it.
+
+    python check_query_plans.py
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.future import select
+
+from app.core.database import SessionLocal
+from app.core.enums import ListView, SortOrder
+from app.core.filtering import AppointmentFilters, MedicalRecordFilters
+from app.core.pagination import PageParams, paginate
+from app.crud.appointment import _appointments_query
+from app.crud.doctor import _doctors_query
+from app.crud.medical_record import _medical_records_query, _search_query
+from app.crud.patient import _patients_query, _patients_assigned_to_doctor_query, _search_patients_query, \
+    _search_terms
+from app.models import Appointment, Doctor, MedicalRecord, Patient, RolePermission, User
+
+PAGE = PageParams(limit=50)
+TODAY = {"start": datetime(2025, 1, 1), "end": datetime(2025, 1, 2)}
+
+
+def hot_queries():
+    search, rank, search_id, _ = _search_query("hypertension")
+    # A term found in a large share of records must still be served by an index, not a scan of every match.
+    common_search, common_rank, common_id, _ = _search_query("pain")
+    return {
+        "list_appointments": paginate(_appointments_query(), Appointment.appointment_time, Appointment.id, PAGE),
+        "list_doctor_appointments": paginate(_appointments_query(doc_id=1), Appointment.appointment_time,
+                                             Appointment.id, PAGE),
+        "list_patient_appointments": paginate(_appointments_query(pat_id=1), Appointment.appointment_time,
+                                              Appointment.id, PAGE),
+        "list_appointments_today": paginate(_appointments_query(filters=AppointmentFilters(**TODAY)),
+                                            Appointment.appointment_time, Appointment.id, PAGE),
+        "list_appointments_by_doctor_filter": paginate(
+            _appointments_query(filters=AppointmentFilters(doctor_id=1, sort=SortOrder.DESC, **TODAY)),
+            Appointment.appointment_time, Appointment.id, PAGE, descending=True),
+        "list_all_medical_records": paginate(_medical_records_query(view=ListView.FULL), MedicalRecord.visit_date,
+                                             MedicalRecord.id, PAGE),
+        "list_medical_records_by_doctor": paginate(_medical_records_query(view=ListView.FULL, doc_id=1),
+                                                   MedicalRecord.visit_date, MedicalRecord.id, PAGE),
+        "list_medical_records_by_patient_filter": paginate(
+            _medical_records_query(view=ListView.FULL, filters=MedicalRecordFilters(patient_id=1, **TODAY)),
+            MedicalRecord.visit_date, MedicalRecord.id, PAGE),
+        "search_medical_records": paginate(search, rank, search_id, PAGE, descending=True),
+        "search_medical_records_common_term": paginate(common_search, common_rank, common_id, PAGE, descending=True),
+        "list_doctors": paginate(_doctors_query(), Doctor.last_name, Doctor.id, PAGE),
+        "list_patients": paginate(_patients_query(), Patient.last_name, Patient.id, PAGE),
+        "list_patients_assigned_to_doctor": paginate(_patients_assigned_to_doctor_query(1), Patient.last_name,
+                                                     Patient.id, PAGE),
+        "search_patients": _search_patients_query(_search_terms("anderson")).limit(10),
+        "search_patient_phone": _search_patients_query(_search_terms("555 0101")).limit(10),
+        "get_user_by_email": select(User).where(User.email == "someone@example.com", User.is_deleted == False),
+        "role_permissions_by_role": select(RolePermission).where(RolePermission.role_id.in_([1, 2])),
+    }
+
+
+def seq_scans(plan: dict) -> list:
+    found = [plan["Relation Name"]] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def check_query_plans() -> bool:
+    ok = True
+    async with SessionLocal() as session:
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, query in hot_queries().items():
+            sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+            result = await session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+            plan = result.scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            tables = seq_scans(plan[0]["Plan"])
+            if tables:
+                ok = False
+                print(f"❌ {name}: sequential scan on {', '.join(sorted(set(tables)))}")
+            else:
+                print(f"✅ {name}")
+        await session.rollback()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_query_plans()) else 1)
@@ -0,0 +1,226 @@
+"""Exports the clinical tables to partitioned Parquet files for offline analysis.
+
+Rows are read through server-side cursors and written batch by batch, so memory stays bounded by ``--batch-size``
+regardless of table size. Soft-deleted rows are never exported. Appointments and medical records are partitioned by
+month; each partition is split into files of at most ``--rows-per-file`` rows.
+
+Every run writes a new snapshot directory and records the highest exported id per table in ``_watermarks.json``.
+With ``--incremental`` only rows with a higher id are exported; rows updated or soft-deleted after they were
+exported are not picked up again, so take a full snapshot periodically.
+
+``--deidentify`` drops patient names, patient and doctor contact numbers and every free-text column (appointment
+reasons and medical record diagnoses, treatments and notes), and reduces dates of birth to the birth year. Ids,
+dates, doctor names and specialties, and patient gender are kept.
+
+    python export_snapshot.py --output snapshots
+    python export_snapshot.py --output snapshots --incremental --deidentify
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Integer, String, Text, Date, DateTime, Boolean, cast, func
+from sqlalchemy.future import select
+
+from app.core.database import stream_rows
+from app.models import Appointment, MedicalRecord, Patient, Doctor
+
+TABLES = {
+    "appointment": (Appointment, Appointment.appointment_time),
+    "medical_record": (MedicalRecord, MedicalRecord.visit_date),
+    "patient": (Patient, None),
+    "doctor": (Doctor, None),
+}
+
+# Free text is dropped as a whole: reasons, diagnoses and treatments routinely carry identifying narrative.
+IDENTIFYING_COLUMNS = {
+    "patient": {"first_name", "last_name", "contact_number", "date_of_birth"},
+    "doctor": {"contact_number"},
+    "appointment": {"reason"},
+    "medical_record": {"diagnosis", "treatment", "notes"},
+}
+
+ARROW_TYPES = {
+    Integer: pa.int32(),
+    String: pa.string(),
+    Text: pa.string(),
+    Date: pa.date32(),
+    DateTime: pa.timestamp("us"),
+    Boolean: pa.bool_(),
+}
+
+WATERMARKS_FILE = "_watermarks.json"
+
+
+def _arrow_type(column):
+    for sql_type, arrow_type in ARROW_TYPES.items():
+        if isinstance(column.type, sql_type):
+            return arrow_type
+    raise TypeError(f"No Parquet type for column {column}")
+
+
+def build_query(table: str, deidentify: bool, watermark: int):
+    model, partition_column = TABLES[table]
+    dropped = IDENTIFYING_COLUMNS.get(table, set()) if deidentify else set()
+    # Generated columns (the medical record search vector) are derived data with no Parquet type.
+    columns = [column for column in model.__table__.columns
+               if column.name not in dropped | {"is_deleted"} and column.computed is None]
+    fields = [pa.field(column.name, _arrow_type(column)) for column in columns]
+    selected = list(columns)
+    if deidentify and table == "patient":
+        selected.append(cast(func.date_part("year", Patient.date_of_birth), Integer).label("birth_year"))
+        fields.append(pa.field("birth_year", pa.int32()))
+
+    query = select(*selected).where(model.is_deleted == False)
+    if watermark:
+        query = query.where(model.id > watermark)
+    # Time-partitioned tables are read in partition order, so only one output file is open at a time.
+    order_by = [partition_column, model.id] if partition_column is not None else [model.id]
+    return query.order_by(*order_by), pa.schema(fields), partition_column
+
+
+class PartitionWriter:
+    def __init__(self, directory: str, schema: pa.Schema, rows_per_file: int):
+        self.directory = directory
+        self.schema = schema
+        self.rows_per_file = rows_per_file
+        self.partition = None
+        self.writer = None
+        self.file_rows = 0
+        self.file_index = 0
+        self.files = 0
+
+    def _open(self, partition: str):
+        path = os.path.join(self.directory, partition) if partition else self.directory
+        os.makedirs(path, exist_ok=True)
+        self.writer = pq.ParquetWriter(os.path.join(path, f"part-{self.file_index:05d}.parquet"), self.schema,
+                                       compression="zstd")
+        self.file_index += 1
+        self.file_rows = 0
+        self.files += 1
+
+    def write(self, partition: str, rows: list):
+        if partition != self.partition:
+            self.close()
+            self.partition = partition
+            self.file_index = 0
+        while rows:
+            if self.writer is None or self.file_rows >= self.rows_per_file:
+                self.close()
+                self._open(partition)
+            chunk, rows = rows[:self.rows_per_file - self.file_rows], rows[self.rows_per_file - self.file_rows:]
+            columns = list(zip(*chunk))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+                schema=self.schema,
+            )
+            self.writer.write_batch(batch)
+            self.file_rows += len(chunk)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def _partition_of(partition_column, row) -> str:
+    if partition_column is None:
+        return ""
+    return f"month={row[partition_column.name]:%Y-%m}"
+
+
+async def export_table(table: str, directory: str, deidentify: bool, watermark: int, batch_size: int,
+                       rows_per_file: int) -> dict:
+    query, schema, partition_column = build_query(table, deidentify, watermark)
+    writer = PartitionWriter(directory, schema, rows_per_file)
+    id_index = schema.get_field_index("id")
+    buffer, partition, rows, max_id = [], None, 0, watermark
+    started = time.perf_counter()
+    try:
+        async for row in stream_rows(query, yield_per=batch_size):
+            row_partition = _partition_of(partition_column, row._mapping)
+            if buffer and (row_partition != partition or len(buffer) >= batch_size):
+                writer.write(partition, buffer)
+                buffer = []
+            partition = row_partition
+            buffer.append(tuple(row))
+            max_id = max(max_id, row[id_index])
+            rows += 1
+        if buffer:
+            writer.write(partition, buffer)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "files": writer.files,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed) if elapsed else 0,
+        "watermark": max_id,
+    }
+
+
+def _read_watermarks(output: str) -> dict:
+    path = os.path.join(output, WATERMARKS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def _write_json(path: str, content: dict):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(content, file, indent=2)
+    os.replace(temporary, path)
+
+
+async def export_snapshot(output: str, tables: list, incremental: bool, deidentify: bool, batch_size: int,
+                          rows_per_file: int) -> dict:
+    watermarks = _read_watermarks(output)
+    snapshot_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    snapshot_dir = os.path.join(output, snapshot_id)
+    manifest = {"snapshot": snapshot_id, "incremental": incremental, "deidentified": deidentify, "tables": {}}
+
+    for table in tables:
+        watermark = watermarks.get(table, 0) if incremental else 0
+        stats = await export_table(table, os.path.join(snapshot_dir, table), deidentify, watermark, batch_size,
+                                   rows_per_file)
+        stats["since_id"] = watermark
+        manifest["tables"][table] = stats
+        print(f"{table}: {stats['rows']} rows in {stats['files']} files, {stats['rows_per_second']} rows/s")
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    _write_json(os.path.join(snapshot_dir, "manifest.json"), manifest)
+    # Only advance the watermarks once every table of the snapshot has been written.
+    watermarks.update({table: stats["watermark"] for table, stats in manifest["tables"].items()})
+    _write_json(os.path.join(output, WATERMARKS_FILE), watermarks)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export clinical tables to partitioned Parquet files.")
+    parser.add_argument("--output", required=True, help="Directory that holds the snapshots and watermarks")
+    parser.add_argument("--tables", default=",".join(TABLES), help="Comma separated tables to export")
+    parser.add_argument("--incremental", action="store_true", help="Only export rows added since the last snapshot")
+    parser.add_argument("--deidentify", action="store_true",
+                        help="Drop patient names, contact numbers and free text; keep the birth year")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Rows fetched and written per batch")
+    parser.add_argument("--rows-per-file", type=int, default=1_000_000, help="Maximum rows per Parquet file")
+    args = parser.parse_args()
+
+    tables = [table.strip() for table in args.tables.split(",") if table.strip()]
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+    asyncio.run(export_snapshot(args.output, tables, args.incremental, args.deidentify, args.batch_size,
+                                args.rows_per_file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Generates a large synthetic dataset for load testing and loads it with COPY.
+
+Doctors, patients (and their users), appointments and medical records are appended after the existing rows, so run
+``seed_initial_data.py`` first. The output is deterministic for a given ``--seed``, ``--start``/``--end`` and
+starting database (the date range defaults to the two years around today).
+
+Distributions are skewed the way production data is: a few doctors carry most of the appointments (Zipf), some
+patients visit far more often than others, appointments cluster on weekdays, business hours and quarter-hour slots,
+and free-text lengths are long-tailed. Active appointments never overlap for a doctor; once a doctor's calendar is
+full, further appointments go to another doctor. Every user shares one password hash, since hashing millions of passwords
+would dominate the run.
+
+After loading, the id sequences, entity counters and activity rollups are brought up to date and the tables are
+analyzed.
+
+    python generate_synthetic_data.py --doctors 2000 --patients 500000 --appointments 10000000 --records 3000000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import text
+from sqlalchemy.future import select
+
+from app.core.auth import get_password_hash
+from app.core.database import SessionLocal, get_driver_connection
+from app.core.enums import RoleEnum, Gender
+from app.crud import counter_crud, rollup_crud
+from app.models import Role
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth", "William",
+    "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Aisha", "Mohammed",
+    "Wei", "Yuki", "Priya", "Carlos", "Sofia", "Olga", "Kwame", "Fatima", "Mateo", "Ingrid", "Ravi", "Chen", "Amara",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez", "Lee",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Nguyen", "Khan",
+    "Patel", "Kim", "Okafor", "Ivanova", "Rossi", "Muller", "Silva", "Tanaka", "Haddad", "Novak", "Cohen", "Singh",
+]
+SPECIALTIES = [
+    ("General Practice", 30), ("Pediatrics", 12), ("Internal Medicine", 12), ("Cardiology", 8), ("Dermatology", 7),
+    ("Orthopedics", 7), ("Obstetrics and Gynecology", 6), ("Psychiatry", 5), ("Neurology", 4), ("Oncology", 3),
+    ("Endocrinology", 3), ("Gastroenterology", 3),
+]
+REASONS = [
+    "Annual checkup", "Follow-up visit", "Flu symptoms", "Back pain", "Prescription refill", "Vaccination",
+    "Blood pressure check", "Skin rash", "Headache", "Lab results review", "Chest pain", "Joint pain",
+]
+DIAGNOSES = [
+    "Essential hypertension", "Type 2 diabetes mellitus", "Acute upper respiratory infection", "Low back pain",
+    "Hyperlipidemia", "Major depressive disorder", "Asthma", "Gastroesophageal reflux disease", "Osteoarthritis",
+    "Hypothyroidism", "Atopic dermatitis", "Migraine", "Urinary tract infection", "Anxiety disorder",
+]
+TREATMENTS = [
+    "Lisinopril 10mg daily", "Metformin 500mg twice daily", "Rest and fluids", "Physical therapy referral",
+    "Atorvastatin 20mg daily", "Sertraline 50mg daily", "Albuterol inhaler as needed", "Omeprazole 20mg daily",
+    "Ibuprofen as needed", "Levothyroxine 50mcg daily", "Topical corticosteroid", "Sumatriptan as needed",
+]
+NOTE_WORDS = (
+    "patient reports improvement since last visit no acute distress vitals stable advised to continue current "
+    "medication follow up in weeks discussed diet exercise sleep hygiene labs ordered symptoms persist mild moderate "
+    "severe denies fever chills nausea family history noted referral considered imaging unremarkable"
+).split()
+
+# Relative weights of weekdays (Mon..Sun) and of the working hours 08..17.
+WEEKDAY_WEIGHTS = [22, 20, 20, 19, 17, 2, 0]
+HOUR_WEIGHTS = [6, 12, 14, 12, 5, 6, 11, 12, 9, 4]
+# Appointments are booked in quarter-hour slots between 08:00 and 18:00 and last 1-4 slots.
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 40
+DURATION_SLOT_WEIGHTS = [35, 45, 10, 10]
+# A doctor with no room left on this many drawn days in a row is taken out of the draw for good.
+DAY_ATTEMPTS_PER_DOCTOR = 20
+
+
+def zipf_cum_weights(count: int, exponent: float) -> list:
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class Generator:
+    def __init__(self, seed: int, start: date, end: date):
+        self.rng = random.Random(seed)
+        self.days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        self.day_weights = list(accumulate(WEEKDAY_WEIGHTS[day.weekday()] for day in self.days))
+        self.hour_weights = list(accumulate(HOUR_WEIGHTS))
+        self.specialty_weights = list(accumulate(weight for _, weight in SPECIALTIES))
+        self.duration_weights = list(accumulate(DURATION_SLOT_WEIGHTS))
+        # Doctor id -> one byte per slot of the date range, set once an active appointment occupies it.
+        self.calendars = {}
+        # Doctors still taking appointments with their Zipf weights, filled on the first appointments() call.
+        self.open_doctor_ids = None
+        self.open_doctor_weights = None
+        self.open_doctor_cum_weights = None
+        self.full_doctors = set()
+
+    def _text(self, mean_words: float, cap: int) -> str:
+        words = min(cap, max(1, int(self.rng.lognormvariate(0, 0.8) * mean_words)))
+        return " ".join(self.rng.choices(NOTE_WORDS, k=words))
+
+    def _times(self, count: int) -> list:
+        days = self.rng.choices(self.days, cum_weights=self.day_weights, k=count)
+        hours = self.rng.choices(range(8, 18), cum_weights=self.hour_weights, k=count)
+        quarters = self.rng.choices((0, 15, 30, 45), k=count)
+        return [
+            datetime(day.year, day.month, day.day, hour, minute) for day, hour, minute in zip(days, hours, quarters)
+        ]
+
+    def users(self, first_id: int, count: int, role_id: int, prefix: str, password: str):
+        return [
+            (first_id + n, f"{prefix}{first_id + n}@synthetic.test", password, role_id, False) for n in range(count)
+        ]
+
+    def doctors(self, first_id: int, first_user_id: int, count: int):
+        names = [name for name, _ in SPECIALTIES]
+        specialties = self.rng.choices(names, cum_weights=self.specialty_weights, k=count)
+        return [
+            (first_id + n, first_user_id + n, self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+             specialties[n], f"+1 555-{self.rng.randrange(10000):04d}", False)
+            for n in range(count)
+        ]
+
+    def patients(self, first_id: int, first_user_id: int, count: int, reference_day: date):
+        genders = self.rng.choices([Gender.FEMALE.value, Gender.MALE.value, Gender.OTHER.value], [49, 49, 2], k=count)
+        return [
+            (first_id + n, first_user_id + n, self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+             reference_day - timedelta(days=int(self.rng.triangular(0, 95, 45) * 365.25)),
+             f"555 {self.rng.randrange(10000):04d}", genders[n], False)
+            for n in range(count)
+        ]
+
+    def _slots(self, count: int) -> list:
+        # (day index, first slot, length in slots), drawn in bulk; collisions are resolved in _book.
+        days = self.rng.choices(range(len(self.days)), cum_weights=self.day_weights, k=count)
+        hours = self.rng.choices(range(10), cum_weights=self.hour_weights, k=count)
+        quarters = self.rng.choices(range(4), k=count)
+        lengths = self.rng.choices((1, 2, 3, 4), cum_weights=self.duration_weights, k=count)
+        return [
+            (day, hour * 4 + quarter, min(length, SLOTS_PER_DAY - hour * 4 - quarter))
+            for day, hour, quarter, length in zip(days, hours, quarters, lengths)
+        ]
+
+    def _open_doctors(self, doctor_ids: list, doctor_weights: list):
+        if self.open_doctor_ids is None:
+            self.open_doctor_ids = list(doctor_ids)
+            self.open_doctor_weights = [high - low for low, high in zip([0, *doctor_weights], doctor_weights)]
+            self.open_doctor_cum_weights = list(doctor_weights)
+
+    def _draw_doctors(self, count: int) -> list:
+        if not self.open_doctor_ids:
+            raise SystemExit("Doctors' calendars are full; widen --start/--end, add doctors or lower --appointments")
+        return self.rng.choices(self.open_doctor_ids, cum_weights=self.open_doctor_cum_weights, k=count)
+
+    def _close_doctor(self, doctor_id: int):
+        index = self.open_doctor_ids.index(doctor_id)
+        del self.open_doctor_ids[index]
+        del self.open_doctor_weights[index]
+        self.open_doctor_cum_weights = list(accumulate(self.open_doctor_weights))
+        self.full_doctors.add(doctor_id)
+
+    def _book(self, doctor_id: int, slot: tuple) -> tuple:
+        # A taken slot moves to the next free run of the same day (or an earlier one), and a full day to another
+        # drawn day. Once a doctor has no room on DAY_ATTEMPTS_PER_DOCTOR days they stop being drawn, so the
+        # busiest doctors' full calendars do not cost a round of redraws for every later appointment.
+        while True:
+            while doctor_id in self.full_doctors:
+                doctor_id = self._draw_doctors(1)[0]
+            calendar = self.calendars.get(doctor_id)
+            if calendar is None:
+                calendar = self.calendars[doctor_id] = bytearray(len(self.days) * SLOTS_PER_DAY)
+            for attempt in range(DAY_ATTEMPTS_PER_DOCTOR):
+                if attempt:
+                    slot = self._slots(1)[0]
+                day_index, first_slot, length = slot
+                day_start = day_index * SLOTS_PER_DAY
+                free = bytes(length)
+                first = calendar.find(free, day_start + first_slot, day_start + SLOTS_PER_DAY)
+                if first < 0:
+                    first = calendar.find(free, day_start, day_start + first_slot + length - 1)
+                if first >= 0:
+                    calendar[first:first + length] = b"\x01" * length
+                    return doctor_id, (day_index, first - day_start, length)
+            self._close_doctor(doctor_id)
+
+    def appointments(self, first_id: int, count: int, doctor_ids: list, doctor_weights: list, patient_ids: list,
+                     patient_weights: list, deleted_ratio: float):
+        self._open_doctors(doctor_ids, doctor_weights)
+        doctors = self._draw_doctors(count)
+        patients = self.rng.choices(patient_ids, cum_weights=patient_weights, k=count)
+        rows = []
+        for n, slot in enumerate(self._slots(count)):
+            doctor_id = doctors[n]
+            deleted = self.rng.random() < deleted_ratio
+            # Soft-deleted appointments do not hold their slot, like in the exclusion constraint.
+            if not deleted:
+                doctor_id, slot = self._book(doctor_id, slot)
+            day_index, first_slot, length = slot
+            day = self.days[day_index]
+            start = datetime(day.year, day.month, day.day, 8) + timedelta(minutes=first_slot * SLOT_MINUTES)
+            minutes = length * SLOT_MINUTES
+            rows.append((first_id + n, patients[n], doctor_id, start, minutes, start + timedelta(minutes=minutes),
+                         self.rng.choice(REASONS) if self.rng.random() < 0.8 else None, deleted))
+        return rows
+
+    def medical_records(self, first_id: int, count: int, doctor_ids: list, doctor_weights: list, patient_ids: list,
+                        patient_weights: list, deleted_ratio: float):
+        doctors = self.rng.choices(doctor_ids, cum_weights=doctor_weights, k=count)
+        patients = self.rng.choices(patient_ids, cum_weights=patient_weights, k=count)
+        return [
+            (first_id + n, patients[n], doctors[n], visit_date, self.rng.choice(DIAGNOSES),
+             self.rng.choice(TREATMENTS), self._text(25, 400) if self.rng.random() < 0.7 else None,
+             self.rng.random() < deleted_ratio)
+            for n, visit_date in enumerate(self._times(count))
+        ]
+
+
+USER_COLUMNS = ["id", "email", "password", "role_id", "is_deleted"]
+DOCTOR_COLUMNS = ["id", "user_id", "first_name", "last_name", "specialty", "contact_number", "is_deleted"]
+PATIENT_COLUMNS = ["id", "user_id", "first_name", "last_name", "date_of_birth", "contact_number", "gender",
+                   "is_deleted"]
+APPOINTMENT_COLUMNS = ["id", "patient_id", "doctor_id", "appointment_time", "duration_minutes", "end_time", "reason",
+                       "is_deleted"]
+RECORD_COLUMNS = ["id", "patient_id", "doctor_id", "visit_date", "diagnosis", "treatment", "notes", "is_deleted"]
+
+
+async def copy_records(table: str, columns: list, records: list):
+    async with SessionLocal() as session:
+        connection = await get_driver_connection(session)
+        await connection.copy_records_to_table(table, records=records, columns=columns)
+        await session.commit()
+
+
+async def next_id(table: str) -> int:
+    async with SessionLocal() as session:
+        return await session.scalar(text(f'SELECT coalesce(max(id), 0) + 1 FROM "{table}"'))
+
+
+async def load_in_batches(table: str, columns: list, first_id: int, total: int, batch_size: int, make_batch):
+    started = time.perf_counter()
+    for offset in range(0, total, batch_size):
+        await copy_records(table, columns, make_batch(first_id + offset, min(batch_size, total - offset)))
+    elapsed = time.perf_counter() - started
+    print(f"{table}: {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+async def load_profiles(generator: Generator, role: RoleEnum, table: str, columns: list, total: int,
+                        batch_size: int, password: str, build) -> list:
+    async with SessionLocal() as session:
+        role_id = await session.scalar(select(Role.id).where(Role.name == role))
+    if role_id is None:
+        raise SystemExit("Roles are missing, run seed_initial_data.py first")
+    # Profile n belongs to user n, so both id ranges are fixed before anything is written.
+    first_user_id = await next_id("user")
+    first_id = await next_id(table)
+    await load_in_batches("user", USER_COLUMNS, first_user_id, total, batch_size,
+                          lambda first, count: generator.users(first, count, role_id, role.value.lower(), password))
+    await load_in_batches(table, columns, first_id, total, batch_size,
+                          lambda first, count: build(first, first_user_id + first - first_id, count))
+    return list(range(first_id, first_id + total))
+
+
+async def finalize():
+    async with SessionLocal() as session:
+        for table in ("user", "doctor", "patient", "appointment", "medical_record"):
+            await session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                f"coalesce((SELECT max(id) FROM \"{table}\"), 1))"
+            ))
+        await session.commit()
+        await counter_crud.reconcile_counters(session)
+        await rollup_crud.rebuild_activity_rollups(session)
+        await session.execute(text("ANALYZE"))
+
+
+async def generate(args):
+    generator = Generator(args.seed, args.start, args.end)
+    password = get_password_hash(args.password)
+
+    doctor_ids = await load_profiles(
+        generator, RoleEnum.DOCTOR, "doctor", DOCTOR_COLUMNS, args.doctors, args.batch_size, password,
+        lambda first, first_user, count: generator.doctors(first, first_user, count),
+    )
+    patient_ids = await load_profiles(
+        generator, RoleEnum.PATIENT, "patient", PATIENT_COLUMNS, args.patients, args.batch_size, password,
+        lambda first, first_user, count: generator.patients(first, first_user, count, args.end),
+    )
+
+    if doctor_ids and patient_ids:
+        # Shuffle before weighting so the busiest doctors and most frequent patients are not simply the lowest ids.
+        generator.rng.shuffle(doctor_ids)
+        generator.rng.shuffle(patient_ids)
+        doctor_weights = zipf_cum_weights(len(doctor_ids), args.doctor_skew)
+        patient_weights = zipf_cum_weights(len(patient_ids), args.patient_skew)
+
+        await load_in_batches("appointment", APPOINTMENT_COLUMNS, await next_id("appointment"), args.appointments,
+                              args.batch_size,
+                              lambda first, count: generator.appointments(first, count, doctor_ids, doctor_weights,
+                                                                          patient_ids, patient_weights,
+                                                                          args.deleted_ratio))
+        await load_in_batches("medical_record", RECORD_COLUMNS, await next_id("medical_record"), args.records,
+                              args.batch_size,
+                              lambda first, count: generator.medical_records(first, count, doctor_ids,
+                                                                             doctor_weights, patient_ids,
+                                                                             patient_weights, args.deleted_ratio))
+    started = time.perf_counter()
+    await finalize()
+    print(f"sequences, counters, rollups and statistics refreshed in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a deterministic synthetic dataset with COPY.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=20_000)
+    parser.add_argument("--appointments", type=int, default=200_000)
+    parser.add_argument("--records", type=int, default=60_000)
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today() - timedelta(days=730),
+                        help="First appointment / visit day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today() + timedelta(days=90),
+                        help="Last appointment / visit day (YYYY-MM-DD)")
+    parser.add_argument("--doctor-skew", type=float, default=0.8, help="Zipf exponent of appointments per doctor")
+    parser.add_argument("--patient-skew", type=float, default=0.6, help="Zipf exponent of visits per patient")
+    parser.add_argument("--deleted-ratio", type=float, default=0.02, help="Share of soft-deleted appointments/records")
+    parser.add_argument("--batch-size", type=int, default=100_000, help="Rows per COPY")
+    parser.add_argument("--password", default="password", help="Password shared by every generated user")
+    args = parser.parse_args()
+    if args.start > args.end:
+        parser.error("--start must not be after --end")
+    asyncio.run(generate(args))
+
+
+if __name__ == "__main__":
+    main()